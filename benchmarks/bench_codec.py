@@ -0,0 +1,59 @@
+"""
+micro-benchmark of JsonCodec: decoding a broadcast listing and encoding
+a create body with each installed json library.  run from the repository
+root with:
+
+  python benchmarks/bench_codec.py [iterations]
+"""
+import json, os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import volar
+
+
+LISTING = json.dumps({
+	'item_count' : '50',
+	'page' : 1,
+	'per_page' : 50,
+	'broadcasts' : [{
+		'id' : i,
+		'title' : u'broadcast {0} \u2013 caf\xe9'.format(i),
+		'description' : 'a longer description of the broadcast ' * 4,
+		'status' : 'archived',
+		'date' : '2014-01-01 00:00:00',
+		'duration' : 3600.5 + i,
+		'image_url' : 'https://cdn.example.com/images/{0}.jpg'.format(i),
+		'sections' : [{'id' : 1, 'name' : 'news'}],
+		'playlists' : [],
+		'template_data' : {'speaker' : 'someone', 'rating' : 4.5},
+	} for i in range(50)],
+})
+
+BODY = {
+	'title' : u'new broadcast caf\xe9',
+	'description' : 'description',
+	'date' : '2014-01-01 00:00:00',
+	'timezone' : 'America/New_York',
+	'section_id' : 3,
+	'template_data' : {'speaker' : 'someone', 'rating' : 4.5},
+}
+
+
+def main():
+	iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	codecs = [('json', volar.JsonCodec(loads_libraries = ()))]
+	for name in ('simplejson', 'ujson'):
+		codec = volar.JsonCodec(loads_libraries = (name,), dumps_libraries = (name,))
+		if codec.loads_library == name:
+			codecs.append((name, codec))
+		else:
+			print '{0:<11} not installed'.format(name)
+
+	for name, codec in codecs:
+		loads = min(timeit.repeat(lambda: codec.loads(LISTING), number = iterations, repeat = 3))
+		dumps = min(timeit.repeat(lambda: codec.dumps(BODY), number = iterations, repeat = 3))
+		print '{0:<11} loads {1:8.1f} us   dumps {2:6.1f} us ({3})'.format(name, loads / iterations * 1e6, dumps / iterations * 1e6, codec.dumps_library)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,85 @@
+"""
+micro-benchmark of request signing: the string building signer volar
+shipped with (kept here verbatim as baseline_signature) against
+RequestSigner.  run from the repository root with:
+
+  python benchmarks/bench_signer.py [iterations]
+"""
+import base64, hashlib, os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import volar
+
+
+def _convert_val_to_str(val):
+	if isinstance(val, bool):
+		if val:
+			return '1'
+		else:
+			return '0'
+	else:
+		return str(val)
+
+
+def baseline_signature(secret, route, method = '', get_params = {}, post_body = None):
+	"""Volar.build_signature as it was before RequestSigner"""
+	if method == '':
+		method = 'GET'
+
+	signature = str(secret) + method.upper() + route.strip('/')
+
+	for key, value in sorted(get_params.iteritems()):
+		if isinstance(value, dict):
+			for v_key, v_value in sorted(value.iteritems()):
+				signature += key + '[' + _convert_val_to_str(v_key) + ']=' + _convert_val_to_str(v_value)
+		elif isinstance(value, list) or isinstance(value, tuple):
+			v_key = 0
+			for v_value in value:
+				signature += key + '[' + _convert_val_to_str(v_key) + ']=' + _convert_val_to_str(v_value)
+				v_key = v_key + 1
+		else:
+			signature += key + '=' + _convert_val_to_str(value)
+
+	signature = signature.encode('ascii')
+	if type(post_body) is str:
+		signature += post_body
+
+	signature = base64.b64encode(hashlib.sha256(signature).digest())[0:43]
+	signature = signature.rstrip('=')
+	return signature
+
+
+SECRET = 'bench-secret'
+ROUTE = 'api/client/broadcast'
+PARAMS = {
+	'api_key' : 'bench-key',
+	'site' : 'mysite',
+	'page' : 3,
+	'per_page' : 50,
+	'sort_by' : 'date',
+	'sort_dir' : 'desc',
+	'list' : 'archived',
+	'autoplay' : True,
+	'before' : '2014-01-01 00:00:00',
+}
+
+
+def main():
+	iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	signer = volar.RequestSigner(SECRET)
+
+	def old():
+		baseline_signature(SECRET, ROUTE, 'GET', PARAMS)
+
+	def new():
+		pairs, canonical = signer.canonicalize(PARAMS)
+		signer.sign('GET', ROUTE, canonical)
+
+	assert baseline_signature(SECRET, ROUTE, 'GET', PARAMS) == signer.sign('GET', ROUTE, signer.canonicalize(PARAMS)[1])
+	for name, fn in (('baseline', old), ('RequestSigner', new)):
+		best = min(timeit.repeat(fn, number = iterations, repeat = 3))
+		print '{0:<14} {1:8.3f} us/request'.format(name, best / iterations * 1e6)
+
+
+if __name__ == '__main__':
+	main()
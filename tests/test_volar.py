@@ -0,0 +1,1447 @@
+"""
+tests for the volar sdk.  requests are made against a small threaded http
+server running on localhost that answers from a queue of canned responses.
+
+run from the repository root with:
+
+  python -m unittest discover tests
+"""
+import base64, datetime, hashlib, json, os, random, shutil, sys, tempfile, threading, time, types, unittest, urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+import volar
+
+
+class StubRequest(object):
+	def __init__(self, method, path, query, headers, body):
+		self.method = method
+		self.path = path
+		self.query = query
+		self.headers = headers
+		self.body = body
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, *args):
+		pass
+
+	def _handle(self):
+		url = urlparse.urlparse(self.path)
+		length = int(self.headers.get('Content-Length') or 0)
+		request = StubRequest(self.command, url.path, dict(urlparse.parse_qsl(url.query)), dict(self.headers), self.rfile.read(length) if length else '')
+		status, headers, body = self.server.stub.answer(request)
+		self.send_response(status)
+		for name, value in headers.items():
+			self.send_header(name, value)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	do_GET = do_POST = _handle
+
+
+class _StubHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def handle_error(self, request, client_address):
+		# kept alive client connections reset when the test process exits
+		pass
+
+
+class StubServer(object):
+	"""
+	local stand-in for the cms.  responses queued with respond() are
+	served in order; once the queue is empty every request is answered by
+	`handler(request)` if it is set, or gets `default`.  every request
+	received is kept in `requests`.
+	"""
+	def __init__(self):
+		self.requests = []
+		self.default = (200, {'Content-Type' : 'application/json'}, '{}')
+		self.handler = None
+		self._responses = []
+		self._lock = threading.Lock()
+		self._server = _StubHTTPServer(('127.0.0.1', 0), _StubHandler)
+		self._server.stub = self
+		self.host = '127.0.0.1:{0}'.format(self._server.server_address[1])
+		thread = threading.Thread(target = self._server.serve_forever)
+		thread.daemon = True
+		thread.start()
+
+	def respond(self, status = 200, body = '{}', headers = None):
+		with self._lock:
+			self._responses.append((status, headers or {}, body))
+
+	def answer(self, request):
+		with self._lock:
+			self.requests.append(request)
+			if self._responses:
+				return self._responses.pop(0)
+			handler = self.handler
+		if handler is not None:
+			return handler(request)
+		return self.default
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+
+class CountingCodec(volar.JsonCodec):
+	"""stdlib codec that counts its calls"""
+	def __init__(self):
+		super(CountingCodec, self).__init__(loads_libraries = ())
+		self.loads_calls = 0
+		self._loads = self.loads
+		self.loads = self._counted_loads
+
+	def _counted_loads(self, s):
+		self.loads_calls += 1
+		return self._loads(s)
+
+
+class StubTestCase(unittest.TestCase):
+	def setUp(self):
+		self.server = StubServer()
+		self.addCleanup(self.server.stop)
+
+	def client(self, **kwargs):
+		return volar.Volar('key', 'secret', self.server.host, **kwargs)
+
+
+def listing(list_name, records, count = 'int', echo_per_page = True, delays = None):
+	"""
+	StubServer handler serving records as a paged list_name listing.
+	count is how the response reports its size: 'int' or 'str' for an
+	item_count of that type, None for no item_count at all.  delays maps
+	page numbers to seconds to wait before answering
+	"""
+	def handle(request):
+		page = int(request.query.get('page', 1))
+		per_page = int(request.query.get('per_page', 2))
+		body = {list_name : records[(page - 1) * per_page:page * per_page], 'page' : page}
+		if echo_per_page:
+			body['per_page'] = per_page
+		if count == 'int':
+			body['item_count'] = len(records)
+		elif count == 'str':
+			body['item_count'] = str(len(records))
+		if delays and page in delays:
+			time.sleep(delays[page])
+		return 200, {'Content-Type' : 'application/json'}, json.dumps(body)
+	return handle
+
+
+class ValidatorCacheTest(StubTestCase):
+	def test_not_modified_returns_stored_body_without_decoding(self):
+		body = json.dumps({'item_count' : '1', 'broadcasts' : [{'id' : 1, 'title' : 'one'}]})
+		self.server.respond(200, body, {'ETag' : '"v1"', 'Content-Type' : 'application/json'})
+		self.server.respond(304, '', {'ETag' : '"v1"'})
+		v = self.client()
+		v.validators = volar.ValidatorCache()
+
+		first = v.broadcasts({'site' : 'mysite'})
+		self.assertEqual(first, json.loads(body))
+		self.assertNotIn('if-none-match', self.server.requests[0].headers)
+
+		v.codec = codec = CountingCodec()
+		second = v.broadcasts({'site' : 'mysite'})
+		self.assertEqual(second, first)
+		self.assertEqual(self.server.requests[1].headers.get('if-none-match'), '"v1"')
+		self.assertEqual(codec.loads_calls, 0)
+		self.assertEqual(v.validators.revalidated, 1)
+
+	def test_changed_listing_is_decoded_and_stored_again(self):
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}]}), {'ETag' : '"v1"'})
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 2}]}), {'ETag' : '"v2"'})
+		self.server.respond(304, '', {'ETag' : '"v2"'})
+		v = self.client()
+		v.validators = volar.ValidatorCache()
+		v.broadcasts({'site' : 'mysite'})
+		self.assertEqual(v.broadcasts({'site' : 'mysite'})['broadcasts'], [{'id' : 2}])
+		self.assertEqual(v.broadcasts({'site' : 'mysite'})['broadcasts'], [{'id' : 2}])
+		self.assertEqual(self.server.requests[2].headers.get('if-none-match'), '"v2"')
+
+
+def _baseline_signature(secret, method, route, params, post_body = None):
+	"""sha256(secret + METHOD + route + sorted params + body), as volar always signed"""
+	def to_str(val):
+		if isinstance(val, bool):
+			return '1' if val else '0'
+		return str(val)
+
+	signature = secret + method.upper() + route.strip('/')
+	for key, value in sorted(params.items()):
+		if isinstance(value, dict):
+			for v_key, v_value in sorted(value.items()):
+				signature += key + '[' + to_str(v_key) + ']=' + to_str(v_value)
+		elif isinstance(value, (list, tuple)):
+			for v_key, v_value in enumerate(value):
+				signature += key + '[' + to_str(v_key) + ']=' + to_str(v_value)
+		else:
+			signature += key + '=' + to_str(value)
+	signature = signature.encode('ascii')
+	if type(post_body) is str:
+		signature += post_body
+	return base64.b64encode(hashlib.sha256(signature).digest())[0:43].rstrip('=')
+
+
+class ListingTestCase(StubTestCase):
+	def records(self, n):
+		return [{'id' : i, 'title' : 'b{0}'.format(i)} for i in range(1, n + 1)]
+
+	def pages(self):
+		return [int(request.query['page']) for request in self.server.requests]
+
+
+class PaginationTest(ListingTestCase):
+	def check(self, records, expected_pages, **kwargs):
+		for stream in (False, True):
+			del self.server.requests[:]
+			found = list(self.client().iter_broadcasts({'site' : 'mysite'}, per_page = 2, stream = stream, **kwargs))
+			self.assertEqual(found, records, stream)
+			self.assertEqual(self.pages(), expected_pages, stream)
+
+	def test_item_count_ends_iteration(self):
+		records = self.records(5)
+		self.server.handler = listing('broadcasts', records)
+		self.check(records, [1, 2, 3])
+
+	def test_item_count_as_string(self):
+		records = self.records(4)
+		self.server.handler = listing('broadcasts', records, count = 'str')
+		self.check(records, [1, 2])
+
+	def test_short_page_ends_iteration_without_item_count(self):
+		records = self.records(5)
+		self.server.handler = listing('broadcasts', records, count = None)
+		self.check(records, [1, 2, 3])
+
+	def test_empty_page_ends_iteration_without_item_count(self):
+		records = self.records(4)
+		self.server.handler = listing('broadcasts', records, count = None)
+		self.check(records, [1, 2, 3])
+		# the page size isn't known at all - only an empty page ends it
+		self.server.handler = listing('broadcasts', records, count = None, echo_per_page = False)
+		del self.server.requests[:]
+		self.assertEqual(list(self.client().iter_broadcasts({'site' : 'mysite', 'page' : 2})), records[2:])
+		self.assertEqual(self.pages(), [2, 3])
+
+	def test_read_ahead_keeps_the_order(self):
+		records = self.records(9)
+		self.server.handler = listing('broadcasts', records, delays = {1 : 0.05})
+		self.assertEqual(list(self.client().iter_broadcasts({'site' : 'mysite'}, per_page = 2, read_ahead = 2)), records)
+		self.assertEqual(sorted(self.pages()), [1, 2, 3, 4, 5])
+
+	def test_failed_page_raises(self):
+		records = self.records(6)
+		handler = listing('broadcasts', records)
+		self.server.handler = lambda request: handler(request) if request.query['page'] != '2' else (200, {}, '{"errors": ["page unavailable"]}')
+		found = []
+		with self.assertRaises(volar.VolarError):
+			for record in self.client().iter_broadcasts({'site' : 'mysite'}, per_page = 2):
+				found.append(record)
+		self.assertEqual(found, records[:2])
+
+
+class FetchAllTest(ListingTestCase):
+	def test_pages_keep_their_order(self):
+		records = self.records(9)
+		# the earlier pages answer last
+		self.server.handler = listing('broadcasts', records, delays = {2 : 0.2, 3 : 0.1})
+		found = self.client().fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 4)
+		self.assertEqual(found, records)
+		self.assertEqual(self.pages()[0], 1)
+		self.assertEqual(sorted(self.pages()), [1, 2, 3, 4, 5])
+		self.assertEqual([request.path for request in self.server.requests], ['/api/client/broadcast'] * 5)
+
+	def test_item_count_as_string(self):
+		records = self.records(6)
+		self.server.handler = listing('broadcasts', records, count = 'str', delays = {2 : 0.1})
+		self.assertEqual(self.client().fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 2), records)
+		self.assertEqual(sorted(self.pages()), [1, 2, 3])
+
+	def test_single_page(self):
+		records = self.records(2)
+		self.server.handler = listing('broadcasts', records)
+		self.assertEqual(self.client().fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 4), records)
+		self.assertEqual(self.pages(), [1])
+
+	def test_walks_the_pages_without_item_count(self):
+		records = self.records(5)
+		self.server.handler = listing('broadcasts', records, count = None)
+		self.assertEqual(self.client().fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 4), records)
+		self.assertEqual(self.pages(), [1, 2, 3])
+
+		self.server.handler = listing('broadcasts', records[:4], count = None)
+		del self.server.requests[:]
+		self.assertEqual(self.client().fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 4), records[:4])
+		self.assertEqual(self.pages(), [1, 2, 3])
+
+	def test_failed_page(self):
+		handler = listing('broadcasts', self.records(9))
+		self.server.handler = lambda request: handler(request) if request.query['page'] != '3' else (404, {}, 'no such page')
+		v = self.client()
+		self.assertIs(v.fetch_all('broadcasts', {'site' : 'mysite'}, per_page = 2, concurrency = 4), False)
+		self.assertTrue(v.error)
+
+
+class RequestSignerTest(unittest.TestCase):
+	def random_scalar(self, rng):
+		return rng.choice([
+			lambda: rng.choice(['', 'abc', 'a b&c=d', '2014-01-01 00:00:00']),
+			lambda: unicode(rng.choice(['title', 'x y'])),
+			lambda: rng.randint(-1000, 1000),
+			lambda: long(rng.randint(0, 10 ** 12)),
+			lambda: rng.uniform(-1e6, 1e6),
+			lambda: rng.choice([True, False]),
+		])()
+
+	def random_params(self, rng):
+		params = {}
+		for i in range(rng.randint(0, 8)):
+			key = rng.choice(['site', 'id', 'page', 'title', 'sort_by', 'list', 'autoplay', 'k' + str(i)])
+			kind = rng.random()
+			if kind < 0.15:
+				params[key] = dict((rng.choice(['a', 'b', 'c', 1, 2]), self.random_scalar(rng)) for j in range(rng.randint(0, 3)))
+			elif kind < 0.3:
+				params[key] = [self.random_scalar(rng) for j in range(rng.randint(0, 3))]
+				if rng.random() < 0.5:
+					params[key] = tuple(params[key])
+			else:
+				params[key] = self.random_scalar(rng)
+		return params
+
+	def test_matches_baseline_signature(self):
+		rng = random.Random(1234)
+		signer = volar.RequestSigner('secret')
+		for i in range(2000):
+			params = self.random_params(rng)
+			method = rng.choice(['', 'GET', 'get', 'POST'])
+			route = rng.choice(['api/client/broadcast', '/api/client/video/', 'api/client/playlist/create'])
+			post_body = rng.choice([None, '', '{"title": "x"}', {'not' : 'signed'}])
+			pairs, canonical = signer.canonicalize(params)
+			self.assertEqual(signer.sign(method, route, canonical, post_body), _baseline_signature('secret', method or 'GET', route, params, post_body), repr(params))
+			self.assertEqual([key for key, value in pairs], sorted(params))
+
+
+class JsonCodecTest(StubTestCase):
+	def fake_ujson(self, precise_float_flag):
+		module = types.ModuleType('ujson')
+		module.calls = []
+		if precise_float_flag:
+			def loads(s, precise_float = False):
+				module.calls.append(precise_float)
+				return json.loads(s)
+		else:
+			def loads(s):
+				module.calls.append(None)
+				return json.loads(s)
+		module.loads = loads
+		sys.modules['ujson'] = module
+		self.addCleanup(sys.modules.pop, 'ujson', None)
+		return module
+
+	def test_fast_decoders_are_opt_in(self):
+		self.fake_ujson(True)
+		simplejson = types.ModuleType('simplejson')
+		simplejson.loads = simplejson.dumps = None
+		sys.modules['simplejson'] = simplejson
+		self.addCleanup(sys.modules.pop, 'simplejson', None)
+		self.assertEqual(volar.JsonCodec().loads_library, 'json')
+		self.assertEqual(volar.JsonCodec(loads_libraries = ('simplejson', )).loads_library, 'simplejson')
+
+	def test_ujson_parses_floats_precisely(self):
+		module = self.fake_ujson(True)
+		codec = volar.JsonCodec(loads_libraries = ('ujson',))
+		self.assertEqual(codec.loads('{"a": 0.1}'), {'a' : 0.1})
+		self.assertEqual(module.calls[-1], True)
+
+		module = self.fake_ujson(False)
+		codec = volar.JsonCodec(loads_libraries = ('ujson',))
+		self.assertEqual(codec.loads('{"a": 0.1}'), {'a' : 0.1})
+		self.assertEqual(module.calls[-1], None)
+
+	def test_unicode_bodies_are_signed_and_sent_as_utf8(self):
+		class UnicodeCodec(volar.JsonCodec):
+			def __init__(self):
+				super(UnicodeCodec, self).__init__(loads_libraries = ())
+				self.dumps = lambda obj: json.dumps(obj, ensure_ascii = False)
+
+		self.server.respond(200, '{"success": true}')
+		v = self.client(codec = UnicodeCodec())
+		v.broadcast_create({'site' : 'mysite', 'title' : u'caf\xe9'})
+		request = self.server.requests[0]
+		self.assertEqual(request.body, u'{"title": "caf\xe9"}'.encode('utf-8'))
+		params = dict(request.query)
+		signature = params.pop('signature')
+		self.assertEqual(signature, _baseline_signature('secret', 'POST', 'api/client/broadcast/create', params, request.body))
+
+
+class RecordingLimit(object):
+	"""RateLimit stand-in counting requests in flight"""
+	def __init__(self):
+		self.in_flight = 0
+		self.statuses = []
+
+	def acquire(self):
+		self.in_flight += 1
+
+	def release(self, status_code = None):
+		self.in_flight -= 1
+		self.statuses.append(status_code)
+
+
+class _FixedLimiter(object):
+	"""RateLimiter stand-in handing out one limit for every route"""
+	def __init__(self, limit):
+		self.limit = limit
+
+	def for_route(self, route, method):
+		return self.limit
+
+
+class RateLimitTest(StubTestCase):
+	def setUp(self):
+		super(RateLimitTest, self).setUp()
+		self.limit = RecordingLimit()
+		self.url = 'http://' + self.server.host + '/api/client/broadcast'
+		self.v = self.client()
+
+	def test_plain_response_is_released_once_read(self):
+		self.v.transport.send('GET', self.url, limit = self.limit)
+		self.assertEqual((self.limit.in_flight, self.limit.statuses), (0, [200]))
+
+	def test_streamed_response_holds_its_slot_until_read(self):
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}, {'id' : 2}]}))
+		r = self.v.transport.send('GET', self.url, limit = self.limit, stream = True)
+		self.assertEqual(self.limit.in_flight, 1)
+		self.assertEqual(json.loads(r.content)['broadcasts'][1], {'id' : 2})
+		self.assertEqual((self.limit.in_flight, self.limit.statuses), (0, [200]))
+		r.close()
+		self.assertEqual(self.limit.statuses, [200])
+
+	def test_streamed_response_releases_its_slot_when_closed(self):
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}]}))
+		r = self.v.transport.send('GET', self.url, limit = self.limit, stream = True)
+		self.assertEqual(self.limit.in_flight, 1)
+		r.close()
+		self.assertEqual((self.limit.in_flight, self.limit.statuses), (0, [200]))
+
+
+class ListStreamTest(StubTestCase):
+	def test_lazy_record_keys_are_decoded(self):
+		body = u'{"broadcasts": [{"id": 1, "caf\xe9": "raw", "na\\u00efve": "escaped", "t": "x"}], "item_count": "1"}'.encode('utf-8')
+		self.server.respond(200, body)
+		records = list(self.client().request('api/client/broadcast', params = { 'site' : 'mysite' }, stream = 'broadcasts', lazy = True))
+		self.assertEqual(records[0].to_dict(), json.loads(body)['broadcasts'][0])
+		self.assertEqual(records[0][u'caf\xe9'], 'raw')
+		self.assertEqual(records[0][u'na\xefve'], 'escaped')
+		self.assertEqual(records[0]['id'], 1)
+
+	def test_unread_stream_is_closed_by_its_context_manager(self):
+		limit = RecordingLimit()
+		v = self.client()
+		v.rate_limiter = _FixedLimiter(limit)
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}, {'id' : 2}]}))
+		with v.request('api/client/broadcast', params = { 'site' : 'mysite' }, stream = 'broadcasts') as records:
+			self.assertEqual(limit.in_flight, 1)
+			for record in records:
+				break
+		self.assertEqual(limit.in_flight, 0)
+
+
+class _RecordingTime(object):
+	"""stands in for the time module inside volar, recording sleeps instead of sleeping"""
+	def __init__(self):
+		self.sleeps = []
+
+	def sleep(self, seconds):
+		self.sleeps.append(seconds)
+
+	def __getattr__(self, name):
+		return getattr(time, name)
+
+
+class _ShiftedTime(object):
+	"""stands in for the time module inside volar, with the clock moved on by offset seconds"""
+	def __init__(self):
+		self.offset = 0
+
+	def time(self):
+		return time.time() + self.offset
+
+	def __getattr__(self, name):
+		return getattr(time, name)
+
+
+class RetryPolicyTest(StubTestCase):
+	def setUp(self):
+		super(RetryPolicyTest, self).setUp()
+		self.clock = _RecordingTime()
+		volar.time = self.clock
+		self.addCleanup(setattr, volar, 'time', time)
+
+	def test_list_reads_are_retried_with_backoff(self):
+		self.server.respond(503)
+		self.server.respond(502)
+		self.server.respond(200, json.dumps({'broadcasts' : []}))
+		v = self.client(retry = volar.RetryPolicy(retries = 3, backoff = 0.5, jitter = False))
+		self.assertEqual(v.broadcasts({'site' : 'mysite'}), {'broadcasts' : []})
+		self.assertEqual(len(self.server.requests), 3)
+		self.assertEqual(self.clock.sleeps, [0.5, 1.0])
+		self.assertEqual(v.pool_stats()['retries'], 2)
+
+	def test_retry_after_is_honored(self):
+		self.server.respond(429, '', {'Retry-After' : '7'})
+		self.server.respond(200, json.dumps({'broadcasts' : []}))
+		v = self.client(retry = volar.RetryPolicy(retries = 3, backoff = 0.5, jitter = False))
+		self.assertEqual(v.broadcasts({'site' : 'mysite'}), {'broadcasts' : []})
+		self.assertEqual(self.clock.sleeps, [7.0])
+
+	def test_long_retry_after_returns_the_response(self):
+		self.server.respond(503, '{"errors": ["maintenance"]}', {'Retry-After' : '600'})
+		v = self.client(retry = volar.RetryPolicy(retries = 3, max_retry_after = 120))
+		self.assertEqual(v.broadcasts({'site' : 'mysite'}), {'errors' : ['maintenance']})
+		self.assertEqual(len(self.server.requests), 1)
+		self.assertEqual(self.clock.sleeps, [])
+
+	def test_retries_run_out(self):
+		for i in range(4):
+			self.server.respond(500, '{"errors": ["boom"]}')
+		v = self.client(retry = volar.RetryPolicy(retries = 2, backoff = 0.1, jitter = False))
+		self.assertEqual(v.broadcasts({'site' : 'mysite'}), {'errors' : ['boom']})
+		self.assertEqual(len(self.server.requests), 3)
+		self.assertEqual(self.clock.sleeps, [0.1, 0.2])
+
+	def test_calls_that_change_data_are_never_retried(self):
+		v = self.client(retry = volar.RetryPolicy(retries = 3))
+		self.server.respond(503, '{"success": false}')
+		v.broadcast_create({'site' : 'mysite', 'title' : 'new'})
+		self.assertEqual(len(self.server.requests), 1)
+		self.assertEqual(self.server.requests[0].method, 'POST')
+
+		# assignplaylist is a GET, but it is not a list read
+		self.server.respond(503, '{"success": false}')
+		v.broadcast_assign_playlist({'site' : 'mysite', 'id' : 1, 'playlist_id' : 2})
+		self.assertEqual(len(self.server.requests), 2)
+		self.assertEqual(self.server.requests[1].method, 'GET')
+		self.assertEqual(self.clock.sleeps, [])
+
+
+class CircuitBreakerTest(StubTestCase):
+	def setUp(self):
+		super(CircuitBreakerTest, self).setUp()
+		self.breaker = volar.CircuitBreaker(failure_threshold = 2, reset_timeout = 0.2)
+		self.v = self.client(circuit_breaker = self.breaker)
+
+	def trip(self):
+		self.server.respond(500)
+		self.server.respond(500)
+		self.assertFalse(self.v.broadcasts({'site' : 'mysite'}))
+		self.assertFalse(self.v.broadcasts({'site' : 'mysite'}))
+		self.assertEqual(self.breaker.state(self.server.host), 'open')
+
+	def test_open_circuit_fails_fast(self):
+		self.trip()
+		self.assertFalse(self.v.broadcasts({'site' : 'mysite'}))
+		self.assertIn('circuit breaker', self.v.error)
+		self.assertEqual(len(self.server.requests), 2)
+		stats = self.v.pool_stats()
+		self.assertEqual((stats['circuit_trips'], stats['circuit_rejections']), (1, 1))
+
+	def test_successful_trial_closes_the_circuit(self):
+		self.trip()
+		time.sleep(0.25)
+		self.assertEqual(self.breaker.state(self.server.host), 'half-open')
+		self.server.respond(200, json.dumps({'broadcasts' : []}))
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'}), {'broadcasts' : []})
+		self.assertEqual(self.breaker.state(self.server.host), 'closed')
+
+	def test_failed_trial_reopens_the_circuit(self):
+		self.trip()
+		time.sleep(0.25)
+		self.server.respond(502)
+		self.assertFalse(self.v.broadcasts({'site' : 'mysite'}))
+		self.assertEqual(self.breaker.state(self.server.host), 'open')
+		self.assertFalse(self.v.broadcasts({'site' : 'mysite'}))
+		self.assertEqual(len(self.server.requests), 3)
+
+	def test_trial_ending_in_other_errors_is_settled(self):
+		class BrokenLimit(object):
+			def __init__(self, error):
+				self.error = error
+
+			def acquire(self):
+				raise self.error
+
+			def release(self, status_code = None):
+				pass
+
+		self.trip()
+		time.sleep(0.25)
+		url = 'http://' + self.server.host + '/api/client/broadcast'
+		self.assertRaises(RuntimeError, self.v.transport.send, 'GET', url, limit = BrokenLimit(RuntimeError('boom')))
+		self.assertEqual(self.breaker.state(self.server.host), 'open')
+
+		time.sleep(0.25)
+		self.assertRaises(KeyboardInterrupt, self.v.transport.send, 'GET', url, limit = BrokenLimit(KeyboardInterrupt()))
+		self.assertEqual(self.breaker.state(self.server.host), 'half-open')
+		self.server.respond(200, json.dumps({'broadcasts' : []}))
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'}), {'broadcasts' : []})
+		self.assertEqual(self.breaker.state(self.server.host), 'closed')
+
+
+class ResponseCacheTest(StubTestCase):
+	def setUp(self):
+		super(ResponseCacheTest, self).setUp()
+		self.v = self.client()
+		self.v.cache = volar.ResponseCache(ttl = 60)
+
+	def requests_for(self, call, *args):
+		"""number of requests call(*args) made to the server"""
+		before = len(self.server.requests)
+		call(*args)
+		return len(self.server.requests) - before
+
+	def test_repeated_calls_are_answered_from_the_cache(self):
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}]}))
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'}), {'broadcasts' : [{'id' : 1}]})
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'}), {'broadcasts' : [{'id' : 1}]})
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'mysite', 'page' : 2}), 1)
+		self.assertEqual(self.requests_for(self.v.videoclips, {'site' : 'mysite'}), 1)
+		self.assertEqual(len(self.server.requests), 3)
+		stats = self.v.cache.stats()
+		self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 3, 3))
+
+	def test_error_responses_are_not_cached(self):
+		self.server.respond(200, '{"errors": ["no such site"]}')
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'nosite'}), 1)
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'nosite'}), 1)
+
+	def test_per_route_ttls(self):
+		clock = _ShiftedTime()
+		volar.time = clock
+		self.addCleanup(setattr, volar, 'time', time)
+		self.v.cache = volar.ResponseCache(ttl = 60, ttls = {'sites' : 600, 'sections' : 0})
+		for call in (self.v.sites, self.v.broadcasts, self.v.sections):
+			self.assertEqual(self.requests_for(call, {'site' : 'mysite'}), 1)
+		self.assertEqual(self.requests_for(self.v.sections, {'site' : 'mysite'}), 1)
+
+		clock.offset = 61
+		self.assertEqual(self.requests_for(self.v.sites, {'site' : 'mysite'}), 0)
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'mysite'}), 1)
+		clock.offset = 601
+		self.assertEqual(self.requests_for(self.v.sites, {'site' : 'mysite'}), 1)
+
+	def test_least_recently_used_listing_is_evicted(self):
+		self.v.cache = volar.ResponseCache(max_entries = 2)
+		self.v.broadcasts({'site' : 'a'})
+		self.v.broadcasts({'site' : 'b'})
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'a'}), 0)
+		self.v.broadcasts({'site' : 'c'})
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'a'}), 0)
+		self.assertEqual(self.requests_for(self.v.broadcasts, {'site' : 'b'}), 1)
+		self.assertEqual(self.v.cache.stats()['evictions'], 2)
+
+	def fill(self):
+		before = len(self.server.requests)
+		for site in ('mysite', 'othersite'):
+			for call in (self.v.broadcasts, self.v.videoclips, self.v.playlists):
+				call({'site' : site})
+		self.assertEqual(len(self.server.requests) - before, 6)
+
+	def cached(self):
+		"""(call, site) pairs still answered from the cache"""
+		found = set()
+		for site in ('mysite', 'othersite'):
+			for call in (self.v.broadcasts, self.v.videoclips, self.v.playlists):
+				if self.requests_for(call, {'site' : site}) == 0:
+					found.add((call.__name__, site))
+		return found
+
+	def test_update_and_delete_invalidate_their_resource_on_their_site(self):
+		for mutate in (self.v.broadcast_update, self.v.broadcast_delete):
+			self.v.cache.clear()
+			self.fill()
+			self.server.respond(200, '{"success": true}')
+			mutate({'site' : 'mysite', 'id' : 1})
+			self.assertEqual(self.cached(), set([('videoclips', 'mysite'), ('playlists', 'mysite'), ('broadcasts', 'othersite'), ('videoclips', 'othersite'), ('playlists', 'othersite')]))
+
+	def test_playlist_assignment_invalidates_playlists_too(self):
+		self.fill()
+		self.server.respond(200, '{"success": true}')
+		self.v.broadcast_assign_playlist({'site' : 'mysite', 'id' : 1, 'playlist_id' : 2})
+		self.assertEqual(self.cached(), set([('videoclips', 'mysite'), ('broadcasts', 'othersite'), ('videoclips', 'othersite'), ('playlists', 'othersite')]))
+
+	def test_failed_mutation_keeps_the_cache(self):
+		self.fill()
+		self.server.respond(200, '{"success": false, "errors": ["no such broadcast"]}')
+		self.v.broadcast_update({'site' : 'mysite', 'id' : 1})
+		self.assertEqual(len(self.cached()), 6)
+
+	def test_clear_sends_the_next_call_to_the_server(self):
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 1}]}))
+		self.server.respond(200, json.dumps({'broadcasts' : [{'id' : 2}]}))
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'})['broadcasts'], [{'id' : 1}])
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'})['broadcasts'], [{'id' : 1}])
+		self.v.cache.clear()
+		self.assertEqual(self.v.broadcasts({'site' : 'mysite'})['broadcasts'], [{'id' : 2}])
+		self.assertEqual(len(self.server.requests), 2)
+
+
+class SqliteCacheBackendTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+
+	def used(self, backend, key):
+		return backend._connection().execute('SELECT used FROM responses WHERE key = ?', (key, )).fetchone()[0]
+
+	def test_hits_touch_entries_coarsely(self):
+		backend = volar.SqliteCacheBackend(os.path.join(self.directory, 'responses.db'), touch_interval = 3600)
+		backend.set('a', {'n' : 1}, time.time() + 60, 'broadcast', ['mysite'])
+		used = self.used(backend, 'a')
+		self.assertEqual(backend.get('a'), {'n' : 1})
+		self.assertEqual(self.used(backend, 'a'), used)
+
+		backend.touch_interval = 0
+		self.assertEqual(backend.get('a'), {'n' : 1})
+		self.assertGreater(self.used(backend, 'a'), used)
+
+	def test_least_recently_used_is_evicted(self):
+		backend = volar.SqliteCacheBackend(os.path.join(self.directory, 'responses.db'), max_entries = 2, touch_interval = 0)
+		backend.set('a', 1, time.time() + 60, 'broadcast', ['mysite'])
+		backend.set('b', 2, time.time() + 60, 'broadcast', ['mysite'])
+		time.sleep(0.01)
+		backend.get('a')
+		backend.set('c', 3, time.time() + 60, 'broadcast', ['mysite'])
+		self.assertEqual([backend.get(key) for key in 'abc'], [1, None, 3])
+
+
+class CacheBackendInvalidationTest(unittest.TestCase):
+	"""the same invalidation cases, run against every backend"""
+	def backends(self):
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		return [volar.MemoryCacheBackend(), volar.SqliteCacheBackend(os.path.join(directory, 'responses.db'))]
+
+	def fill(self, backend):
+		expires = time.time() + 60
+		for key, resource, sites in (
+			('all', 'broadcast', []),
+			('mysite', 'broadcast', ['mysite']),
+			('my_site', 'broadcast', ['my_site']),
+			('myXsite', 'broadcast', ['myXsite']),
+			('my%site', 'broadcast', ['my%site']),
+			('both', 'broadcast', ['mysite', 'othersite']),
+			('clips', 'videoclip', ['mysite'])
+		):
+			backend.set(key, key, expires, resource, sites)
+
+	def remaining(self, backend):
+		return set(key for key in ('all', 'mysite', 'my_site', 'myXsite', 'my%site', 'both', 'clips') if backend.get(key) is not None)
+
+	def test_invalidation(self):
+		for backend in self.backends():
+			name = type(backend).__name__
+			self.fill(backend)
+			backend.invalidate('broadcast', 'my_site')
+			self.assertEqual(self.remaining(backend), set(['mysite', 'myXsite', 'my%site', 'both', 'clips']), name)
+
+			self.fill(backend)
+			backend.invalidate('broadcast', 'my%site')
+			self.assertEqual(self.remaining(backend), set(['mysite', 'my_site', 'myXsite', 'both', 'clips']), name)
+
+			self.fill(backend)
+			backend.invalidate('broadcast', 'othersite')
+			self.assertEqual(self.remaining(backend), set(['mysite', 'my_site', 'myXsite', 'my%site', 'clips']), name)
+
+			self.fill(backend)
+			backend.invalidate('broadcast')
+			self.assertEqual(self.remaining(backend), set(['clips']), name)
+
+
+class _FailingCommit(object):
+	"""wraps a sqlite connection whose commit() fails"""
+	def __init__(self, db):
+		self._db = db
+
+	def commit(self):
+		raise volar.sqlite3.OperationalError('disk I/O error')
+
+	def __getattr__(self, name):
+		return getattr(self._db, name)
+
+
+def record_id(request):
+	"""id of the record a write request is about"""
+	if 'id' in request.query:
+		return int(request.query['id'])
+	return json.loads(request.body).get('id')
+
+
+class VolarBatchTest(StubTestCase):
+	def setUp(self):
+		super(VolarBatchTest, self).setUp()
+		self.slow = {}
+		self.server.handler = self.handle
+
+	def handle(self, request):
+		ident = record_id(request)
+		time.sleep(self.slow.pop((request.path, ident), 0))
+		if ident == 13:
+			return 503, {}, 'broadcast 13 is locked'
+		return 200, {'Content-Type' : 'application/json'}, json.dumps({'success' : True, 'id' : ident, 'path' : request.path})
+
+	def calls(self):
+		return [(request.path, record_id(request)) for request in self.server.requests]
+
+	def test_results_come_back_in_add_order(self):
+		batch = self.client().batch(max_in_flight = 4)
+		self.slow[('/api/client/broadcast/update', 1)] = 0.2
+		self.assertEqual(batch.broadcast_update({'site' : 'mysite', 'id' : 1, 'title' : 'one'}), 0)
+		self.assertEqual(batch.broadcast_update({'site' : 'mysite', 'id' : 2, 'title' : 'two'}), 1)
+		self.assertEqual(batch.broadcast_assign_playlist({'site' : 'mysite', 'id' : 1, 'playlist_id' : 4}), 2)
+		self.assertEqual(batch.videoclip_delete({'site' : 'mysite', 'id' : 1}), 3)
+		self.assertEqual(len(batch), 4)
+		results = batch.execute()
+		self.assertEqual(results, [
+			{'method' : 'broadcast_update', 'result' : {'success' : True, 'id' : 1, 'path' : '/api/client/broadcast/update'}, 'error' : ''},
+			{'method' : 'broadcast_update', 'result' : {'success' : True, 'id' : 2, 'path' : '/api/client/broadcast/update'}, 'error' : ''},
+			{'method' : 'broadcast_assign_playlist', 'result' : {'success' : True, 'id' : 1, 'path' : '/api/client/broadcast/assignplaylist'}, 'error' : ''},
+			{'method' : 'videoclip_delete', 'result' : {'success' : True, 'id' : 1, 'path' : '/api/client/videoclip/delete'}, 'error' : ''}
+		])
+		self.assertIs(batch.results, results)
+		self.assertEqual(len(batch), 0)
+		self.assertEqual(len(self.server.requests), 4)
+
+	def test_calls_on_one_record_run_in_order(self):
+		batch = self.client().batch(max_in_flight = 4)
+		self.slow[('/api/client/broadcast/update', 1)] = 0.2
+		batch.broadcast_update({'site' : 'mysite', 'id' : 1, 'title' : 'one'})
+		batch.broadcast_assign_playlist({'site' : 'mysite', 'id' : 1, 'playlist_id' : 4})
+		batch.broadcast_update({'site' : 'mysite', 'id' : 2, 'title' : 'two'})
+		batch.broadcast_delete({'site' : 'mysite', 'id' : 1})
+		batch.execute()
+		calls = self.calls()
+		self.assertEqual([call for call in calls if call[1] == 1], [
+			('/api/client/broadcast/update', 1),
+			('/api/client/broadcast/assignplaylist', 1),
+			('/api/client/broadcast/delete', 1)
+		])
+		# record 2 did not wait for the slow update of record 1
+		self.assertLess(calls.index(('/api/client/broadcast/update', 2)), calls.index(('/api/client/broadcast/assignplaylist', 1)))
+
+	def test_errors_are_mapped_to_their_call(self):
+		batch = self.client().batch()
+		batch.broadcast_update({'site' : 'mysite', 'id' : 12, 'title' : 'twelve'})
+		batch.broadcast_update({'site' : 'mysite', 'id' : 13, 'title' : 'thirteen'})
+		batch.broadcast_update({'id' : 14, 'title' : 'fourteen'})
+		batch.broadcast_update({'site' : 'mysite', 'id' : 15, 'title' : 'fifteen'})
+		results = batch.execute()
+		self.assertEqual([(item['method'], item['result'] is False) for item in results], [('broadcast_update', False), ('broadcast_update', True), ('broadcast_update', True), ('broadcast_update', False)])
+		self.assertEqual([item['result']['id'] for item in (results[0], results[3])], [12, 15])
+		self.assertEqual((results[0]['error'], results[3]['error']), ('', ''))
+		self.assertTrue(results[1]['error'].startswith('Request failed with following error: '))
+		self.assertEqual(results[2]['error'], 'site is required')
+		# the call without a site never reached the server
+		self.assertEqual(sorted(self.calls()), [('/api/client/broadcast/update', 12), ('/api/client/broadcast/update', 13), ('/api/client/broadcast/update', 15)])
+
+	def test_calls_on_one_record_continue_after_an_error(self):
+		batch = self.client().batch()
+		batch.broadcast_update({'site' : 'mysite', 'id' : 13, 'title' : 'thirteen'})
+		batch.broadcast_delete({'site' : 'mysite', 'id' : 13})
+		results = batch.execute()
+		self.assertEqual([item['result'] for item in results], [False, False])
+		self.assertEqual(self.calls(), [('/api/client/broadcast/update', 13), ('/api/client/broadcast/delete', 13)])
+
+	def test_with_block_executes_on_exit(self):
+		with self.client().batch() as batch:
+			batch.playlist_create({'site' : 'mysite', 'title' : 'new'})
+			batch.playlist_update({'site' : 'mysite', 'id' : 3, 'title' : 'renamed'})
+			self.assertEqual(self.server.requests, [])
+		self.assertEqual([item['result']['path'] for item in batch.results], ['/api/client/playlist/create', '/api/client/playlist/update'])
+
+		with self.assertRaises(KeyError):
+			with self.client().batch() as batch:
+				batch.playlist_delete({'site' : 'mysite', 'id' : 3})
+				raise KeyError('abandoned')
+		self.assertIsNone(batch.results)
+		self.assertEqual(len(self.server.requests), 2)
+
+	def test_only_writes_can_be_batched(self):
+		with self.assertRaises(ValueError):
+			self.client().batch().add('broadcasts', {'site' : 'mysite'})
+
+
+class PlaylistMembersTest(ListingTestCase):
+	def setUp(self):
+		super(PlaylistMembersTest, self).setUp()
+		self.failures = {}
+		# the members span three pages, and the second one answers last
+		self.broadcasts = listing('broadcasts', self.records(5), delays = {2 : 0.2})
+		self.videoclips = listing('videoclips', [{'id' : 10, 'title' : 'v10'}])
+		self.server.handler = self.handle
+
+	def handle(self, request):
+		if request.path == '/api/client/broadcast':
+			return self.broadcasts(request)
+		if request.path == '/api/client/videoclip':
+			return self.videoclips(request)
+		failure = self.failures.get((request.path, request.query['id']))
+		if failure is not None:
+			return failure
+		return 200, {'Content-Type' : 'application/json'}, '{"success": true}'
+
+	def changes(self):
+		return sorted((request.path.rsplit('/', 1)[-1], int(request.query['id'])) for request in self.server.requests if request.path.endswith('playlist'))
+
+	def test_only_differences_are_sent(self):
+		result = self.client().playlist_set_members({'site' : 'mysite', 'id' : 12, 'broadcast_ids' : [4, 5, 6, 7, 1], 'videoclip_ids' : []}, concurrency = 4)
+		self.assertEqual(result, {
+			'success' : True,
+			'assigned' : {'broadcasts' : [6, 7], 'videoclips' : []},
+			'removed' : {'broadcasts' : [2, 3], 'videoclips' : [10]},
+			'unchanged' : 3,
+			'errors' : []
+		})
+		self.assertEqual(len(self.server.requests), 9)
+		listings = [request for request in self.server.requests if 'page' in request.query]
+		self.assertEqual(sorted((request.path, int(request.query['page'])) for request in listings), [
+			('/api/client/broadcast', 1), ('/api/client/broadcast', 2), ('/api/client/broadcast', 3), ('/api/client/videoclip', 1)
+		])
+		self.assertEqual(set(request.query['playlist_id'] for request in self.server.requests), set(['12']))
+		self.assertEqual(self.changes(), [('assignplaylist', 6), ('assignplaylist', 7), ('removeplaylist', 2), ('removeplaylist', 3), ('removeplaylist', 10)])
+
+	def test_errors_are_mapped_to_ids(self):
+		self.failures[('/api/client/broadcast/assignplaylist', '7')] = (200, {'Content-Type' : 'application/json'}, '{"success": false, "errors": ["broadcast 7 not found"]}')
+		self.failures[('/api/client/broadcast/removeplaylist', '3')] = (503, {}, 'unavailable')
+		result = self.client().playlist_set_members({'site' : 'mysite', 'id' : 12, 'broadcast_ids' : [4, 5, 6, 7, 1]}, concurrency = 4)
+		self.assertIs(result['success'], False)
+		self.assertEqual(result['assigned'], {'broadcasts' : [6, 7]})
+		self.assertEqual(result['removed'], {'broadcasts' : [2, 3]})
+		self.assertEqual([(error['method'], error['id']) for error in result['errors']], [('broadcast_assign_playlist', 7), ('broadcast_remove_playlist', 3)])
+		self.assertEqual(result['errors'][0]['error'], ['broadcast 7 not found'])
+		self.assertTrue(result['errors'][1]['error'].startswith('Request failed with following error: '))
+		# videoclips were not asked for, so they are neither read nor touched
+		self.assertNotIn('/api/client/videoclip', [request.path for request in self.server.requests])
+		self.assertEqual(len(self.server.requests), 7)
+
+	def test_unreadable_members(self):
+		self.broadcasts = lambda request: (503, {}, 'unavailable')
+		v = self.client()
+		self.assertIs(v.playlist_set_members({'site' : 'mysite', 'id' : 12, 'broadcast_ids' : [1]}), False)
+		self.assertTrue(v.error)
+		self.assertEqual(self.changes(), [])
+
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+class VolarExportTest(ListingTestCase):
+	columns = ('id', 'title', 'date', 'status', 'section_id')
+
+	def setUp(self):
+		super(VolarExportTest, self).setUp()
+		self.server.handler = listing('broadcasts', [
+			{'id' : 1, 'title' : 'one', 'date' : '2014-05-12 23:00:00', 'status' : 'archived', 'section_id' : 7, 'template_data' : {'venue' : 'Hall A'}},
+			{'id' : 2, 'title' : u'caf\xe9', 'date' : '', 'status' : 'scheduled', 'section_id' : '7', 'template_data' : {'venue' : 'Hall B'}},
+			{'id' : 3, 'title' : 'three', 'date' : 'soon', 'status' : 'archived', 'section_id' : 'none', 'template_data' : [{'title' : 'venue', 'value' : 'Hall C'}, {'title' : 'round', 'value' : 2}]},
+			{'id' : '4', 'title' : '', 'status' : 'archived', 'section_id' : None},
+			{'id' : 5, 'title' : 'five', 'date' : '2014-05-13 01:30:00', 'status' : 'upcoming', 'section_id' : 8, 'template_data' : {'venue' : ''}}
+		])
+
+	def export(self, **kwargs):
+		kwargs.setdefault('columns', self.columns)
+		return volar.VolarExport(self.client(), 'broadcasts', per_page = 2, **kwargs)
+
+	def test_chunks(self):
+		export = self.export(chunk_size = 2)
+		chunks = list(export._chunks({'site' : 'mysite'}))
+		self.assertEqual(chunks, [
+			[
+				('id', 'int', [1, 2]),
+				('title', 'text', ['one', u'caf\xe9']),
+				('date', 'date', [datetime.datetime(2014, 5, 12, 23, 0, 0), None]),
+				('status', 'category', ['archived', 'scheduled']),
+				('section_id', 'int', [7, 7]),
+				('template_data.venue', 'text', ['Hall A', 'Hall B'])
+			],
+			[
+				('id', 'int', [3, 4]),
+				('title', 'text', ['three', None]),
+				('date', 'date', [None, None]),
+				('status', 'category', ['archived', 'archived']),
+				('section_id', 'int', [None, None]),
+				('template_data.venue', 'text', ['Hall C', None])
+			],
+			[
+				('id', 'int', [5]),
+				('title', 'text', ['five']),
+				('date', 'date', [datetime.datetime(2014, 5, 13, 1, 30, 0)]),
+				('status', 'category', ['upcoming']),
+				('section_id', 'int', [8]),
+				('template_data.venue', 'text', [None])
+			]
+		])
+		# 'round' first shows up after the columns were settled
+		self.assertEqual(export.dropped_fields, set(['round']))
+		self.assertEqual(self.pages(), [1, 2, 3])
+		self.assertEqual(self.server.requests[0].query['site'], 'mysite')
+
+	def test_template_fields(self):
+		export = self.export(columns = ('id', ), template_fields = ('round', 'venue'), chunk_size = 10)
+		self.assertEqual(list(export._chunks({'site' : 'mysite'})), [[
+			('id', 'int', [1, 2, 3, 4, 5]),
+			('template_data.round', 'text', [None, None, '2', None, None]),
+			('template_data.venue', 'text', ['Hall A', 'Hall B', 'Hall C', None, None])
+		]])
+		self.assertEqual(export.dropped_fields, set())
+
+		export = self.export(columns = ('id', ), template_fields = (), chunk_size = 10)
+		self.assertEqual(list(export._chunks({'site' : 'mysite'})), [[('id', 'int', [1, 2, 3, 4, 5])]])
+
+	def test_empty_listing(self):
+		self.server.handler = listing('broadcasts', [])
+		self.assertEqual(list(self.export()._chunks({'site' : 'mysite'})), [[(name, volar._EXPORT_COLUMN_TYPES.get(name, 'text'), []) for name in self.columns]])
+		self.assertEqual(self.pages(), [1])
+
+	def test_failed_listing(self):
+		self.server.handler = lambda request: (200, {}, '{"errors": ["no such site"]}')
+		with self.assertRaises(volar.VolarError):
+			list(self.export()._chunks({'site' : 'nosite'}))
+
+	def test_default_columns(self):
+		columns = volar.VolarExport(self.client(), 'broadcasts').columns
+		self.assertEqual(columns[0], 'id')
+		self.assertNotIn('embed_code', columns)
+		self.assertNotIn('template_data', columns)
+		with self.assertRaises(ValueError):
+			volar.VolarExport(self.client(), 'broadcast')
+
+	@unittest.skipUnless(numpy, 'needs numpy')
+	def test_to_numpy(self):
+		columns = self.export(chunk_size = 2).to_numpy({'site' : 'mysite'})
+		self.assertEqual(list(columns), list(self.columns) + ['template_data.venue'])
+		self.assertEqual(columns['id'].tolist(), [1, 2, 3, 4, 5])
+		self.assertEqual(columns['section_id'].tolist(), [7, 7, -1, -1, 8])
+		self.assertEqual(columns['status'].tolist(), ['archived', 'scheduled', 'archived', 'archived', 'upcoming'])
+		self.assertEqual(int((columns['status'] == 'archived').sum()), 3)
+		self.assertEqual(columns['title'].tolist(), ['one', u'caf\xe9', 'three', None, 'five'])
+
+
+class VolarSyncTest(ListingTestCase):
+	def setUp(self):
+		super(VolarSyncTest, self).setUp()
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.path = os.path.join(self.directory, 'sync.json')
+		# newest first, as the listing is requested with sort_dir = desc
+		self.catalog = self.records(5)[::-1]
+		self.server.handler = listing('broadcasts', self.catalog)
+
+	def sync(self):
+		return volar.VolarSync(self.client(), self.path, resources = ('broadcasts', ), per_page = 2)
+
+	def run_sync(self, **kwargs):
+		del self.server.requests[:]
+		return [(event.action, event.record['id']) for event in self.sync().run('mysite', **kwargs)]
+
+	def test_first_run_creates_everything(self):
+		self.assertEqual(self.run_sync(), [('created', 5), ('created', 4), ('created', 3), ('created', 2), ('created', 1)])
+		self.assertEqual(self.pages(), [1, 2, 3])
+		query = self.server.requests[0].query
+		self.assertEqual((query['site'], query['sort_by'], query['sort_dir'], query['per_page']), ('mysite', 'id', 'desc', '2'))
+		with open(self.path, 'rb') as fp:
+			state = json.load(fp)
+		self.assertEqual(state['mysite']['broadcasts']['watermark'], 5)
+		self.assertEqual(sorted(state['mysite']['broadcasts']['fingerprints']), ['1', '2', '3', '4', '5'])
+
+	def test_incremental_run_stops_at_the_watermark(self):
+		self.run_sync()
+		self.catalog[0:0] = [{'id' : 7, 'title' : 'b7'}, {'id' : 6, 'title' : 'b6'}]
+		self.assertEqual(self.run_sync(), [('created', 7), ('created', 6)])
+		# the second page holds the old watermark, so nothing further is read
+		self.assertEqual(self.pages(), [1, 2])
+		self.assertEqual(self.sync().state['mysite']['broadcasts']['watermark'], 7)
+
+		self.assertEqual(self.run_sync(), [])
+		self.assertEqual(self.pages(), [1])
+
+	def test_full_run_finds_updates_and_deletions(self):
+		self.run_sync()
+		self.catalog[3]['title'] = 'b2, edited'
+		del self.catalog[2]
+		self.assertEqual(self.run_sync(full = True), [('updated', 2), ('deleted', 3)])
+		self.assertEqual(sorted(self.pages()), [1, 2])
+		state = self.sync().state['mysite']['broadcasts']
+		self.assertEqual(state['watermark'], 5)
+		self.assertEqual(sorted(state['fingerprints']), ['1', '2', '4', '5'])
+
+		self.assertEqual(self.run_sync(full = True), [])
+
+	def test_incremental_run_misses_deletions(self):
+		self.run_sync()
+		del self.catalog[0]
+		self.assertEqual(self.run_sync(), [])
+		self.assertIn('5', self.sync().state['mysite']['broadcasts']['fingerprints'])
+
+	def test_state_is_only_saved_when_asked(self):
+		sync = self.sync()
+		self.assertEqual(len(list(sync.run('mysite', save = False))), 5)
+		self.assertFalse(os.path.exists(self.path))
+		self.assertEqual(self.run_sync(), [('created', 5), ('created', 4), ('created', 3), ('created', 2), ('created', 1)])
+
+		# an abandoned run leaves the watermark alone
+		self.catalog.insert(0, {'id' : 6, 'title' : 'b6'})
+		events = self.sync().run('mysite')
+		self.assertEqual(next(events).record['id'], 6)
+		del events
+		self.assertEqual(self.run_sync(), [('created', 6)])
+
+
+class VolarMirrorTest(StubTestCase):
+	def setUp(self):
+		super(VolarMirrorTest, self).setUp()
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.mirror = volar.VolarMirror(self.client(), os.path.join(self.directory, 'catalog.db'), resources = ('broadcasts', ))
+		self.addCleanup(self.mirror.close)
+
+	def listing(self, *ids):
+		self.server.respond(200, json.dumps({'item_count' : str(len(ids)), 'broadcasts' : [{'id' : i, 'title' : 'b{0}'.format(i)} for i in ids]}))
+
+	def test_refresh_does_not_walk_playlists_by_default(self):
+		self.listing(2, 1)
+		self.assertEqual(self.mirror.refresh('mysite')['created'], 2)
+		self.assertEqual([r.path for r in self.server.requests], ['/api/client/broadcast'])
+		self.assertEqual([r['id'] for r in self.mirror.find('broadcasts', site = 'mysite', sort_by = 'id')], [2, 1])
+
+	def test_edits_are_found_with_a_date_watermark(self):
+		mirror = volar.VolarMirror(self.client(), os.path.join(self.directory, 'dated.db'), resources = ('broadcasts', ), watermark_field = 'date')
+		self.addCleanup(mirror.close)
+		self.server.respond(200, json.dumps({'broadcasts' : [
+			{'id' : 1, 'title' : 'one', 'date' : '2014-01-02 00:00:00'},
+			{'id' : 2, 'title' : 'two', 'date' : '2014-01-01 00:00:00'}
+		]}))
+		self.assertEqual(mirror.refresh('mysite'), {'created' : 2, 'updated' : 0, 'deleted' : 0})
+		self.assertEqual(self.server.requests[0].query['sort_by'], 'date')
+
+		self.server.respond(200, json.dumps({'broadcasts' : [
+			{'id' : 2, 'title' : 'two, edited', 'date' : '2014-01-03 00:00:00'},
+			{'id' : 1, 'title' : 'one', 'date' : '2014-01-02 00:00:00'}
+		]}))
+		self.assertEqual(mirror.refresh('mysite'), {'created' : 0, 'updated' : 1, 'deleted' : 0})
+		self.assertEqual(mirror.find('broadcasts', id = 2)[0]['title'], 'two, edited')
+
+	def test_watermark_is_saved_after_the_database_commit(self):
+		self.listing(2, 1)
+		db = self.mirror._db
+		self.mirror._db = _FailingCommit(db)
+		self.assertRaises(volar.sqlite3.OperationalError, self.mirror.refresh, 'mysite')
+		self.assertFalse(os.path.exists(self.mirror.sync.state_path))
+		self.assertNotIn('mysite', self.mirror.sync.state)
+
+		# nothing is left pending for a later commit to write out
+		self.mirror._db = db
+		db.commit()
+		self.assertEqual(self.mirror.find('broadcasts', site = 'mysite'), [])
+
+		# the next refresh sees the same records again
+		self.listing(2, 1)
+		self.assertEqual(self.mirror.refresh('mysite')['created'], 2)
+		with open(self.mirror.sync.state_path) as fp:
+			self.assertEqual(json.load(fp)['mysite']['broadcasts']['watermark'], 2)
+
+
+class FakeStorage(object):
+	"""
+	in-memory stand-in for boto's s3 classes.  install() swaps them into
+	volar for the length of a test.  part numbers in `failures` raise the
+	listed exceptions, one per attempt, before being stored, and
+	complete_upload() raises complete_error if it is set.
+	"""
+	PART = 5 * 1024 * 1024
+
+	def __init__(self):
+		self.connections = 0
+		self.objects = {}
+		self.uploads = {}
+		self.failures = {}
+		self.complete_error = None
+		self._lock = threading.Lock()
+
+	def install(self, test):
+		storage = self
+
+		class Connection(object):
+			def __init__(self, **credentials):
+				with storage._lock:
+					storage.connections += 1
+				self.credentials = credentials
+
+		class Bucket(object):
+			def __init__(self, connection = None, name = None):
+				self.connection = connection
+				self.name = name
+
+			def initiate_multipart_upload(self, key_name, headers = None, policy = None):
+				mp = MultiPartUpload(self)
+				mp.key_name = key_name
+				with storage._lock:
+					mp.id = 'upload-{0}'.format(len(storage.uploads) + 1)
+					storage.uploads[mp.id] = { 'parts' : {}, 'state' : 'open' }
+				return mp
+
+		class Key(object):
+			def __init__(self, bucket = None, name = None):
+				self.bucket = bucket
+				self.name = name
+
+			def set_contents_from_file(self, fp, policy = None, md5 = None, cb = None, num_cb = None):
+				storage.objects[self.name] = fp.read()
+				return len(storage.objects[self.name])
+
+			def set_contents_from_filename(self, path, **kwargs):
+				with open(path, 'rb') as fp:
+					return self.set_contents_from_file(fp, **kwargs)
+
+		class MultiPartUpload(object):
+			def __init__(self, bucket):
+				self.bucket = bucket
+				self.key_name = self.id = None
+
+			def upload_part_from_file(self, fp, part_num, size = None, cb = None, num_cb = None):
+				with storage._lock:
+					pending = storage.failures.get(part_num)
+					error = pending.pop(0) if pending else None
+				if error is not None:
+					raise error
+				storage.uploads[self.id]['parts'][part_num] = fp.read(size)
+
+			def get_all_parts(self):
+				return [_Part(num) for num in storage.uploads[self.id]['parts']]
+
+			def complete_upload(self):
+				if storage.complete_error is not None:
+					raise storage.complete_error
+				upload = storage.uploads[self.id]
+				upload['state'] = 'complete'
+				storage.objects[self.key_name] = ''.join(data for num, data in sorted(upload['parts'].items()))
+
+			def cancel_upload(self):
+				storage.uploads[self.id]['state'] = 'cancelled'
+
+		for name, fake in (('S3Connection', Connection), ('S3Bucket', Bucket), ('S3Key', Key), ('S3MultiPartUpload', MultiPartUpload)):
+			test.addCleanup(setattr, volar, name, getattr(volar, name))
+			setattr(volar, name, fake)
+		return self
+
+
+class _Part(object):
+	def __init__(self, part_number):
+		self.part_number = part_number
+
+
+class UploadTestCase(StubTestCase):
+	"""uploads against FakeStorage, with the s3 handshake answered by the stub server"""
+	def setUp(self):
+		super(UploadTestCase, self).setUp()
+		self.storage = FakeStorage().install(self)
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.v = self.client()
+		self.v.multipart_threshold = FakeStorage.PART
+		self.v.multipart_chunksize = FakeStorage.PART
+		self.v.multipart_workers = 2
+		self.v.multipart_retries = 1
+		clock = _RecordingTime()
+		volar.time = clock
+		self.addCleanup(setattr, volar, 'time', time)
+		self.handshakes = 0
+		self.server.default = None
+		self.server.answer = self.answer
+
+	def answer(self, request):
+		with self.server._lock:
+			self.server.requests.append(request)
+			self.handshakes += 1
+			number = self.handshakes
+		body = json.dumps({'id' : number, 'key' : 'tmp/{0}'.format(number), 'bucket' : 'bucket', 'access_key' : 'ak', 'secret' : 'sk', 'token' : 'tk'})
+		return 200, {'Content-Type' : 'application/json'}, body
+
+	def write(self, name, size, seed = 0):
+		path = os.path.join(self.directory, name)
+		rng = random.Random(seed)
+		with open(path, 'wb') as fp:
+			fp.write(''.join(chr(rng.randint(0, 255)) for i in range(1024)) * (size // 1024))
+			fp.write('x' * (size % 1024))
+		return path
+
+
+class MultipartUploadTest(UploadTestCase):
+	def test_parts_are_assembled_in_order(self):
+		path = self.write('big.bin', FakeStorage.PART * 2 + 1000)
+		self.storage.failures[2] = [IOError('connection reset')]
+		result = self.v.upload_file(path)
+		self.assertEqual(result['bytes_uploaded'], FakeStorage.PART * 2 + 1000)
+		with open(path, 'rb') as fp:
+			self.assertEqual(self.storage.objects[result['tmp_file_name']], fp.read())
+
+	def test_failed_upload_is_cancelled(self):
+		path = self.write('big.bin', FakeStorage.PART * 2)
+		self.storage.failures[1] = [IOError('connection reset'), IOError('connection reset')]
+		self.assertFalse(self.v.upload_file(path))
+		self.assertIn('part 1 failed', self.v.error)
+		self.assertEqual([upload['state'] for upload in self.storage.uploads.values()], ['cancelled'])
+
+	def test_upload_failing_to_complete_is_cancelled(self):
+		path = self.write('big.bin', FakeStorage.PART * 2)
+		self.storage.complete_error = IOError('connection reset')
+		self.assertFalse(self.v.upload_file(path))
+		self.assertEqual([upload['state'] for upload in self.storage.uploads.values()], ['cancelled'])
+
+	def test_failed_journaled_upload_is_kept_for_resuming(self):
+		self.v.upload_journal_dir = os.path.join(self.directory, 'journals')
+		path = self.write('big.bin', FakeStorage.PART * 2)
+		self.storage.failures[1] = [IOError('connection reset'), IOError('connection reset')]
+		self.assertFalse(self.v.upload_file(path, journal_key = 'k'))
+		self.assertEqual([upload['state'] for upload in self.storage.uploads.values()], ['open'])
+
+		result = self.v.upload_file(path, journal_key = 'k')
+		self.assertEqual(result['bytes_uploaded'], FakeStorage.PART * 2)
+		self.assertEqual(self.handshakes, 1)
+		self.assertEqual([upload['state'] for upload in self.storage.uploads.values()], ['complete'])
+
+
+class S3ConnectionCacheTest(UploadTestCase):
+	def test_connections_are_reused_across_uploads_and_threads(self):
+		small = self.write('small.bin', 1000)
+		big = self.write('big.bin', FakeStorage.PART * 3)
+		self.assertTrue(self.v.upload_file(small))
+		self.assertEqual(self.storage.connections, 1)
+		# how many part workers run at once depends on scheduling, so only
+		# the bound is fixed: the uploading thread's connection plus one per
+		# part worker, however many uploads are made
+		for i in range(3):
+			hits = self.v.s3_connections.hits
+			self.assertTrue(self.v.upload_file(big))
+			self.assertLessEqual(self.storage.connections, 1 + self.v.multipart_workers)
+			self.assertGreater(self.v.s3_connections.hits, hits)
+		opened = self.storage.connections
+		self.assertTrue(self.v.upload_file(small))
+		self.assertEqual(self.storage.connections, opened)
+
+	def test_expiring_tokens_are_not_reused(self):
+		cache = volar.S3ConnectionCache(refresh_margin = 60)
+		handshake = {'bucket' : 'b', 'access_key' : 'ak', 'secret' : 'sk', 'token' : 'tk', 'expiration' : time.time() + 30}
+		bucket = cache.checkout(handshake)
+		cache.checkin(handshake, bucket)
+		self.assertIsNot(cache.checkout(handshake), bucket)
+		self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+
+class UploadIndexTest(UploadTestCase):
+	def setUp(self):
+		super(UploadIndexTest, self).setUp()
+		self.v.upload_index = volar.UploadIndex(os.path.join(self.directory, 'uploads.db'))
+
+	def copy(self, path, name):
+		copy = os.path.join(self.directory, name)
+		shutil.copyfile(path, copy)
+		return copy
+
+	def test_large_file_copies_are_deduplicated(self):
+		big = self.write('big.bin', FakeStorage.PART * 2)
+		first = self.v.upload_file(big)
+		self.assertEqual(self.v.upload_file(self.copy(big, 'copy.bin')), first)
+		self.assertEqual(self.handshakes, 1)
+
+	def test_large_files_keyed_on_path_without_hash_large(self):
+		self.v.upload_index.hash_large = False
+		big = self.write('big.bin', FakeStorage.PART * 2)
+		first = self.v.upload_file(big)
+		self.assertEqual(self.v.upload_file(big), first)
+		self.assertNotEqual(self.v.upload_file(self.copy(big, 'copy.bin')), first)
+		self.assertEqual(self.handshakes, 2)
+
+	def test_small_stream_is_looked_up_before_sending(self):
+		small = self.write('small.bin', 5000)
+		first = self.v.upload_file(small)
+		with open(small, 'rb') as fp:
+			self.assertEqual(self.v.upload_file(iter([fp.read()])), first)
+		self.assertEqual(self.handshakes, 1)
+
+	def test_long_stream_is_recorded_for_later_uploads(self):
+		big = self.write('big.bin', FakeStorage.PART * 2 + 10)
+		with open(big, 'rb') as fp:
+			first = self.v.upload_file(fp)
+		self.assertEqual(self.v.upload_file(self.copy(big, 'copy.bin')), first)
+		self.assertEqual(self.handshakes, 1)
+
+
+class UploadJournalTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.path = os.path.join(self.directory, 'upload.json')
+
+	def test_expiry_counts_from_creation(self):
+		journal = volar.UploadJournal(self.path, 60)
+		journal.start({'key' : 'tmp/1'}, 'upload-1', 5)
+		journal.created -= 61
+		journal.part_done(1)	# saving refreshes the mtime
+
+		self.assertEqual(volar.UploadJournal(self.path, 60).upload_id, None)
+		self.assertEqual(volar.UploadJournal(self.path, 120).upload_id, 'upload-1')
+		volar.UploadJournal.sweep(self.directory, 120)
+		self.assertTrue(os.path.exists(self.path))
+		volar.UploadJournal.sweep(self.directory, 60)
+		self.assertFalse(os.path.exists(self.path))
+
+
+class StreamUploadTest(UploadTestCase):
+	def chunks(self, parts, fail_after = None):
+		chunk = 'y' * (1024 * 1024)
+		for i in range(parts * 5):
+			if fail_after is not None and i == fail_after:
+				raise IOError('transcoder died')
+			yield chunk
+
+	def test_stream_is_sent_as_multipart(self):
+		result = self.v.upload_file(self.chunks(2), filename = 'live.ts')
+		self.assertEqual(result['bytes_uploaded'], FakeStorage.PART * 2)
+		self.assertEqual(self.storage.objects[result['tmp_file_name']], 'y' * (FakeStorage.PART * 2))
+		self.assertEqual(self.server.requests[0].query['filename'], 'live.ts')
+
+	def test_upload_events_report_multipart_only_when_used(self):
+		class Recorder(volar.VolarObserver):
+			def __init__(self):
+				self.uploads = []
+
+			def upload_finished(self, event):
+				self.uploads.append(event.multipart)
+
+		self.v.observer = observer = Recorder()
+		self.v.upload_file(iter(['short stream']))
+		self.v.upload_file(self.chunks(2))
+		self.v.upload_file(self.write('small.bin', 1000))
+		self.v.upload_file(self.write('big.bin', FakeStorage.PART))
+		self.assertEqual(observer.uploads, [False, True, False, True])
+
+	def test_stream_read_error_cancels_the_upload(self):
+		self.assertFalse(self.v.upload_file(self.chunks(3, fail_after = 7)))
+		self.assertIn('transcoder died', self.v.error)
+		self.assertEqual([upload['state'] for upload in self.storage.uploads.values()], ['cancelled'])
+
+
+if __name__ == '__main__':
+	unittest.main()
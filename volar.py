@@ -12,23 +12,2178 @@ depends on:
     http://docs.python-requests.org/en/latest/user/install/#install
   - Amazon's boto module:
     https://aws.amazon.com/sdkforpython/
+
+optionally uses:
+
+  - numpy and / or pyarrow, for VolarExport
+  - simplejson or ujson, for faster json decoding (see JsonCodec)
 """
-import hashlib, base64, requests, json, os
+import hashlib, base64, requests, json, os, sys, threading, time, calendar, datetime, itertools, sqlite3, copy, Queue, random, urlparse, email.utils, re
+from collections import OrderedDict, namedtuple, deque
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 try:
 	from boto.s3.connection import S3Connection
 	from boto.s3.bucket import Bucket as S3Bucket
 	from boto.s3.key import Key as S3Key
+	from boto.s3.multipart import MultiPartUpload as S3MultiPartUpload
+	from boto.utils import compute_md5
 except Exception, e:
 	raise Exception("Could not import amazon's boto toolkit.  If it is not installed, follow the instructions on https://aws.amazon.com/sdkforpython/")
 
 
+class VolarError(Exception):
+	"""
+	raised by the iterator helpers (Volar.iter_broadcasts and friends),
+	which cannot report a failure by returning False part way through.
+	"""
+	pass
+
+
+# list calls that take 'page' / 'per_page'.  each returns its records
+# under a key with the same name as the method
+LIST_METHODS = ('sites', 'broadcasts', 'videoclips', 'templates', 'sections', 'playlists')
+LIST_ROUTES = {
+	'sites' : 'api/client/info',
+	'broadcasts' : 'api/client/broadcast',
+	'videoclips' : 'api/client/videoclip',
+	'templates' : 'api/client/template',
+	'sections' : 'api/client/section',
+	'playlists' : 'api/client/playlist'
+}
+
+# last route segment of calls that change records
+MUTATION_ACTIONS = ('create', 'update', 'delete', 'assignplaylist', 'removeplaylist', 'archive', 'poster')
+
+
+def _route_resource(route):
+	"""'api/client/broadcast/update' -> 'broadcast'"""
+	parts = route.strip('/').split('/')
+	return parts[2] if len(parts) > 2 else None
+
+
+# sample body used to check that an encoder writes exactly what json.dumps does
+_CODEC_PROBE = {
+	'title' : u'caf\xe9 <b>"quoted"</b> / \\ \u2028',
+	'id' : 12,
+	'ratio' : 0.1,
+	'big' : 1e20,
+	'flags' : [True, False, None],
+	'template_data' : {'field' : 'value', 'n' : -3}
+}
+
+
+class JsonCodec(object):
+	"""
+	json encoding and decoding used by Volar.  responses are decoded with
+	the first of `loads_libraries` that is installed, falling back to the
+	stdlib json module, which is all that is used by default.
+
+	faster decoders are opt-in, as their results are not quite those of
+	json.loads: simplejson returns str rather than unicode for ascii
+	strings, and ujson's default float parsing can differ in the last
+	digit (it is passed precise_float = True where the installed version
+	accepts it).  ex. JsonCodec(loads_libraries = ('ujson', 'simplejson')).
+	note that responses from a SqliteCacheBackend are always decoded with
+	the stdlib json module.
+
+	request bodies are signed, so dumps() must produce exactly the bytes
+	json.dumps would.  a library from `dumps_libraries` is only used if
+	its output matches json.dumps on a sample body.  none are tried by
+	default: simplejson matches but is slower than the stdlib's C encoder
+	on python 2.7, and ujson writes compact json.
+
+	any object with dumps() and loads() can be passed to Volar as `codec`.
+	dumps() may return unicode; Volar encodes it to utf-8 before signing.
+	"""
+	def __init__(self, loads_libraries = (), dumps_libraries = ()):
+		self.loads = json.loads
+		self.dumps = json.dumps
+		self.loads_library = self.dumps_library = 'json'
+		for name in loads_libraries:
+			module = self._import(name)
+			if module is not None:
+				self.loads = module.loads
+				if name == 'ujson':
+					self.loads = self._precise_ujson_loads(module)
+				self.loads_library = name
+				break
+		for name in dumps_libraries:
+			module = self._import(name)
+			try:
+				if module is None or module.dumps(_CODEC_PROBE) != json.dumps(_CODEC_PROBE):
+					continue
+			except Exception:
+				continue
+			self.dumps = module.dumps
+			self.dumps_library = name
+			break
+
+	@staticmethod
+	def _precise_ujson_loads(ujson):
+		try:
+			ujson.loads('0.1', precise_float = True)
+		except TypeError:
+			# versions without the flag always parse floats precisely
+			return ujson.loads
+		return lambda s: ujson.loads(s, precise_float = True)
+
+	@staticmethod
+	def _import(name):
+		try:
+			return __import__(name)
+		except ImportError:
+			return None
+
+	def __repr__(self):
+		return 'JsonCodec(loads = {0}, dumps = {1})'.format(self.loads_library, self.dumps_library)
+
+
+def _response_text(r):
+	"""
+	body of r for decoding.  utf-8 (json's default) bodies are handed over
+	as raw bytes, skipping requests' own decoding to unicode
+	"""
+	encoding = r.encoding
+	if encoding is None or encoding.lower() in ('utf-8', 'utf8'):
+		return r.content
+	return r.text
+
+
+class CacheBackend(object):
+	"""
+	storage used by ResponseCache.  subclass this to keep cached responses
+	somewhere else (memcached, redis, ...).  keys are strings, values are
+	decoded json responses.
+	"""
+	def get(self, key):
+		"""returns the value stored under key if it hasn't expired, otherwise None"""
+		raise NotImplementedError()
+
+	def set(self, key, value, expires, resource, sites):
+		"""
+		stores value under key until the unix time `expires`.  resource is
+		the type of record listed ('broadcast', 'playlist', ...) and sites
+		the list of site slugs the listing covers, for invalidate()
+		"""
+		raise NotImplementedError()
+
+	def invalidate(self, resource, site = None):
+		"""drops entries of resource that cover site (all sites if site is None)"""
+		raise NotImplementedError()
+
+	def clear(self):
+		raise NotImplementedError()
+
+	def stats(self):
+		return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+	"""per-process, size-bounded lru storage.  the default ResponseCache backend"""
+	def __init__(self, max_entries = 1024):
+		self.max_entries = max_entries
+		self.evictions = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is None or entry[0] <= time.time():
+				return None
+			self._entries[key] = entry
+		return copy.deepcopy(entry[1])
+
+	def set(self, key, value, expires, resource, sites):
+		entry = (expires, copy.deepcopy(value), resource, sites)
+		with self._lock:
+			self._entries.pop(key, None)
+			self._entries[key] = entry
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last = False)
+				self.evictions += 1
+
+	def invalidate(self, resource, site = None):
+		with self._lock:
+			for key in [key for key, entry in self._entries.iteritems() if entry[2] == resource and (site is None or not entry[3] or site in entry[3])]:
+				del self._entries[key]
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self):
+		with self._lock:
+			return { 'entries' : len(self._entries), 'evictions' : self.evictions }
+
+
+class SqliteCacheBackend(CacheBackend):
+	"""
+	storage in a local sqlite file, shared by every process on the host
+	that points at the same path (ex. all the workers of a web server).
+	invalidations made by any process are seen by all of them.  the least
+	recently used entries are evicted once max_entries is reached.
+
+	a hit only writes to the database if the entry's last use was recorded
+	more than touch_interval seconds ago, so that reads of popular entries
+	don't queue up behind each other for the write lock.  the lru order is
+	accurate to within touch_interval.
+
+	>>>	v.cache = volar.ResponseCache(backend = volar.SqliteCacheBackend('/var/cache/volar/responses.db'))
+	"""
+	def __init__(self, path, max_entries = 10000, touch_interval = 30):
+		self.path = path
+		self.max_entries = max_entries
+		self.touch_interval = touch_interval
+		self.evictions = 0
+		self._lock = threading.Lock()
+		self._db = None
+		self._pid = None
+
+	def _connection(self):
+		# connections must not be carried across a fork
+		if self._pid != os.getpid():
+			self._db = sqlite3.connect(self.path, timeout = 30, check_same_thread = False)
+			self._db.execute('PRAGMA journal_mode=WAL')
+			self._db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL, resource TEXT, sites TEXT)')
+			self._db.execute('CREATE INDEX IF NOT EXISTS responses_resource ON responses (resource)')
+			self._db.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+			self._db.commit()
+			self._pid = os.getpid()
+		return self._db
+
+	def get(self, key):
+		now = time.time()
+		with self._lock:
+			db = self._connection()
+			row = db.execute('SELECT value, used FROM responses WHERE key = ? AND expires > ?', (key, now)).fetchone()
+			if row is None:
+				return None
+			if now - row[1] >= self.touch_interval:
+				db.execute('UPDATE responses SET used = ? WHERE key = ?', (now, key))
+				db.commit()
+		return json.loads(row[0])
+
+	def set(self, key, value, expires, resource, sites):
+		now = time.time()
+		with self._lock:
+			db = self._connection()
+			db.execute('INSERT OR REPLACE INTO responses (key, value, expires, used, resource, sites) VALUES (?, ?, ?, ?, ?, ?)', (key, json.dumps(value), expires, now, resource, ',' + ''.join(site + ',' for site in sites)))
+			db.execute('DELETE FROM responses WHERE expires <= ?', (now, ))
+			excess = db.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+			if excess > 0:
+				db.execute('DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used LIMIT ?)', (excess, ))
+				self.evictions += excess
+			db.commit()
+
+	def invalidate(self, resource, site = None):
+		with self._lock:
+			db = self._connection()
+			if site is None:
+				db.execute('DELETE FROM responses WHERE resource = ?', (resource, ))
+			else:
+				# sites is ',' for listings not limited to any site (',,' in older databases)
+				pattern = '%,' + site.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + ',%'
+				db.execute("DELETE FROM responses WHERE resource = ? AND (sites IN (',', ',,') OR sites LIKE ? ESCAPE '\\')", (resource, pattern))
+			db.commit()
+
+	def clear(self):
+		with self._lock:
+			db = self._connection()
+			db.execute('DELETE FROM responses')
+			db.commit()
+
+	def stats(self):
+		with self._lock:
+			entries = self._connection().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+		return { 'entries' : entries, 'evictions' : self.evictions }
+
+
+class ResponseCache(object):
+	"""
+	cache for the responses of list calls (Volar.sites, broadcasts,
+	videoclips, templates, sections and playlists).  entries live for a
+	per-call ttl.  a successful create, update, delete (or playlist
+	assignment, archive or poster) call made through any Volar instance
+	using the same backend drops the cached listings of that resource type
+	on that site.
+
+	by default responses are kept in this process (MemoryCacheBackend),
+	with the least recently used entries evicted once max_entries is
+	reached.  pass backend = SqliteCacheBackend(path) to share one cache
+	between all the processes on a host.
+
+	>>>	v.cache = volar.ResponseCache(ttl = 30, ttls = {'sites': 600, 'sections': 300})
+
+	Args:
+		ttl (float): seconds a response stays cached
+		max_entries (int): maximum number of cached responses, if no
+		  backend is given
+		ttls (dict): ttl overrides, keyed by list call name
+		backend (CacheBackend): where responses are stored
+	"""
+	def __init__(self, ttl = 60, max_entries = 1024, ttls = None, backend = None):
+		self.ttl = ttl
+		self.route_ttls = {}
+		for name, route_ttl in (ttls or {}).iteritems():
+			self.route_ttls[LIST_ROUTES[name]] = route_ttl
+		self.backend = backend if backend is not None else MemoryCacheBackend(max_entries)
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+
+	def cacheable(self, route):
+		return route.strip('/') in LIST_ROUTES.values()
+
+	def get(self, key):
+		"""gets a copy of the cached response for key, or None"""
+		value = self.backend.get(self._key(key))
+		with self._lock:
+			if value is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return value
+
+	def set(self, key, route, sites, value):
+		"""caches value under key.  sites are the site slugs the response covers"""
+		ttl = self.route_ttls.get(route.strip('/'), self.ttl)
+		if ttl <= 0:
+			return
+		self.backend.set(self._key(key), value, time.time() + ttl, _route_resource(route), sites)
+
+	def invalidate(self, resource, site = None):
+		"""drops cached listings of resource on site (or on every site if site is None)"""
+		self.backend.invalidate(resource, site)
+
+	def clear(self):
+		self.backend.clear()
+
+	def stats(self):
+		stats = { 'hits' : self.hits, 'misses' : self.misses }
+		stats.update(self.backend.stats())
+		return stats
+
+	@staticmethod
+	def _key(key):
+		return hashlib.sha1(json.dumps(key)).hexdigest()
+
+
+class ValidatorCache(object):
+	"""
+	remembers the ETag / Last-Modified validators of list responses along
+	with their decoded bodies, so Volar.request can ask the server whether
+	a listing changed instead of downloading it again.  when the server
+	answers 304 Not Modified, the remembered body is returned as is,
+	without any json parsing.  the least recently used entries are dropped
+	once max_entries is reached.
+
+	>>>	v.validators = volar.ValidatorCache(max_entries = 512)
+	"""
+	def __init__(self, max_entries = 256):
+		self.max_entries = max_entries
+		self.revalidated = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def headers(self, key):
+		"""conditional request headers for key (empty if nothing is known about it)"""
+		with self._lock:
+			entry = self._entries.get(key)
+		if entry is None:
+			return {}
+		headers = {}
+		if entry[0]:
+			headers['If-None-Match'] = entry[0]
+		if entry[1]:
+			headers['If-Modified-Since'] = entry[1]
+		return headers
+
+	def not_modified(self, key):
+		"""gets a copy of the remembered body for key after a 304, or None"""
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is None:
+				return None
+			self._entries[key] = entry
+			self.revalidated += 1
+		return copy.deepcopy(entry[2])
+
+	def store(self, key, response, body):
+		etag = response.headers.get('ETag')
+		last_modified = response.headers.get('Last-Modified')
+		with self._lock:
+			self._entries.pop(key, None)
+			if not etag and not last_modified:
+				return
+			self._entries[key] = (etag, last_modified, copy.deepcopy(body))
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last = False)
+
+
+def _num_pages(result):
+	"""number of pages in a listing, or None if the response doesn't say"""
+	try:
+		if 'num_pages' in result:
+			return int(result['num_pages'])
+		item_count = int(result['item_count'])
+		per_page = int(result['per_page'])
+	except (KeyError, TypeError, ValueError):
+		return None
+	if per_page <= 0:
+		return None
+	return (item_count + per_page - 1) // per_page
+
+
+def _read_ahead(iterable, depth):
+	"""
+	consumes iterable on a background thread, keeping at most depth items
+	buffered ahead of the caller.  exceptions raised by iterable are
+	re-raised in the caller's thread.
+	"""
+	buf = Queue.Queue(depth)
+	stop = threading.Event()
+	done = object()
+
+	def put(item):
+		while not stop.is_set():
+			try:
+				buf.put(item, timeout = 0.1)
+				return True
+			except Queue.Full:
+				pass
+		return False
+
+	def produce():
+		try:
+			for item in iterable:
+				if not put((item, None)):
+					return
+		except Exception:
+			put((done, sys.exc_info()))
+			return
+		put((done, None))
+
+	producer = threading.Thread(target = produce)
+	producer.daemon = True
+	producer.start()
+	try:
+		while True:
+			item, exc_info = buf.get()
+			if item is done:
+				if exc_info is not None:
+					raise exc_info[0], exc_info[1], exc_info[2]
+				return
+			yield item
+	finally:
+		stop.set()
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],:"]')
+_json_decoder = json.JSONDecoder()
+
+
+def _object_key(token):
+	"""key of a json object from its string token, as json.loads would return it"""
+	if '\\' in token:
+		return json.loads(token)
+	key = token[1:-1]
+	if type(key) is str:
+		return key.decode('utf-8')
+	return key
+
+
+def _object_offsets(s, pos):
+	"""
+	scans the json object starting at s[pos] without decoding it.  returns
+	({key : offset of its value, relative to pos}, end of the object), or
+	None if s ends before the object does.
+	"""
+	offsets = {}
+	depth = 0
+	key = start = None
+	for m in _JSON_TOKENS.finditer(s, pos):
+		token = m.group()
+		c = token[0]
+		if c == '"':
+			if len(token) == 1:
+				return None	# string runs past the end of s
+			if depth == 1 and start is None:
+				key = token
+		elif c == ':':
+			if depth == 1:
+				start = _WHITESPACE.match(s, m.end()).end()
+		elif c == ',':
+			if depth == 1:
+				offsets[_object_key(key)] = start - pos
+				start = None
+		elif c == '{' or c == '[':
+			depth += 1
+		else:
+			depth -= 1
+			if depth == 0:
+				if start is not None:
+					offsets[_object_key(key)] = start - pos
+				return offsets, m.end()
+	return None
+
+
+class LazyRecord(object):
+	"""
+	read-only, dict-like record of a streamed list response.  it keeps the
+	record's raw json text and only decodes a field the first time it is
+	read, so large fields that are never looked at (embed code, template
+	data, ...) never become python objects.  to_dict() decodes everything.
+	"""
+	__slots__ = ('_raw', '_offsets', '_values')
+
+	def __init__(self, raw, offsets):
+		self._raw = raw
+		self._offsets = offsets
+		self._values = None
+
+	def __getitem__(self, key):
+		values = self._values
+		if values is None:
+			values = self._values = {}
+		elif key in values:
+			return values[key]
+		value = values[key] = _json_decoder.raw_decode(self._raw, self._offsets[key])[0]
+		return value
+
+	def get(self, key, default = None):
+		if key in self._offsets:
+			return self[key]
+		return default
+
+	def __contains__(self, key):
+		return key in self._offsets
+
+	def __iter__(self):
+		return iter(self._offsets)
+
+	def __len__(self):
+		return len(self._offsets)
+
+	def keys(self):
+		return self._offsets.keys()
+
+	def items(self):
+		return [(key, self[key]) for key in self._offsets]
+
+	def iteritems(self):
+		for key in self._offsets:
+			yield key, self[key]
+
+	def to_dict(self):
+		return dict(self.items())
+
+	def __repr__(self):
+		return 'LazyRecord({0!r})'.format(self._raw)
+
+
+class _JsonReader(object):
+	"""cursor over json text arriving in chunks"""
+	def __init__(self, chunks):
+		self._chunks = chunks
+		self.buf = ''
+		self.pos = 0
+		self.eof = False
+
+	def more(self):
+		"""appends the next chunk to buf.  False at the end of the data"""
+		while not self.eof:
+			try:
+				chunk = next(self._chunks)
+			except StopIteration:
+				self.eof = True
+				break
+			if chunk:
+				if self.pos > 65536:
+					self.buf = self.buf[self.pos:] + chunk
+					self.pos = 0
+				else:
+					self.buf += chunk
+				return True
+		return False
+
+	def peek(self):
+		"""next non-whitespace character, without consuming it"""
+		while True:
+			self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+			if self.pos < len(self.buf):
+				return self.buf[self.pos]
+			if not self.more():
+				raise ValueError("unexpected end of json data")
+
+	def expect(self, chars):
+		c = self.peek()
+		if c not in chars:
+			raise ValueError("expected one of '{0}' at offset {1}, found '{2}'".format(chars, self.pos, c))
+		self.pos += 1
+		return c
+
+	def value(self):
+		self.peek()
+		while True:
+			try:
+				value, end = _json_decoder.raw_decode(self.buf, self.pos)
+			except ValueError:
+				if not self.more():
+					raise
+				continue
+			if end == len(self.buf) and self.more():
+				continue	# a number could go on in the next chunk
+			self.pos = end
+			return value
+
+	def lazy_value(self):
+		if self.peek() != '{':
+			return self.value()
+		while True:
+			found = _object_offsets(self.buf, self.pos)
+			if found is not None:
+				break
+			if not self.more():
+				raise ValueError("unexpected end of json data")
+		offsets, end = found
+		record = LazyRecord(self.buf[self.pos:end], offsets)
+		self.pos = end
+		return record
+
+
+class ListStream(object):
+	"""
+	records of one list response, decoded one by one as the response body
+	arrives instead of after all of it has been read.  every other
+	top-level field of the response ('item_count', 'page', 'errors', ...)
+	ends up in `meta` once it has been read, which for fields that come
+	after the records means once iteration is over.
+
+	returned by Volar.request when it is called with `stream`.  the
+	records can be iterated over once.
+
+	until it has been iterated to the end, a ListStream holds on to its
+	connection (and its RateLimit slot, if there is one).  one that may
+	not be read to the end should be closed, most easily by using it as a
+	context manager:
+
+	>>>	with v.request('api/client/broadcast', params = { 'site' : 'mysite' }, stream = 'broadcasts') as records:
+			for record in records:
+				if record['id'] == wanted:
+					break
+	"""
+	chunk_size = 64 * 1024
+
+	def __init__(self, response, list_name, lazy = False):
+		self.response = response
+		self.list_name = list_name
+		self.lazy = lazy
+		self.meta = {}
+		self.found = False
+
+	def __iter__(self):
+		reader = _JsonReader(self.response.iter_content(self.chunk_size))
+		try:
+			reader.expect('{')
+			if reader.peek() == '}':
+				return
+			while True:
+				key = reader.value()
+				reader.expect(':')
+				if key == self.list_name and reader.peek() == '[':
+					self.found = True
+					reader.expect('[')
+					if reader.peek() == ']':
+						reader.pos += 1
+					else:
+						decode = reader.lazy_value if self.lazy else reader.value
+						while True:
+							yield decode()
+							if reader.expect(',]') == ']':
+								break
+				else:
+					self.meta[key] = reader.value()
+				if reader.expect(',}') == '}':
+					return
+		except (ValueError, requests.RequestException) as e:
+			raise VolarError("could not read {0} response: {1}".format(self.list_name, e))
+		finally:
+			self.close()
+
+	def close(self):
+		self.response.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def __del__(self):
+		# last resort for streams that were neither read to the end nor closed
+		try:
+			self.close()
+		except Exception:
+			pass
+
+
+_DATE = re.compile(r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)$')
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+_interned = {}
+
+
+def _compact(value):
+	"""ascii-only unicode as str, which is a quarter of the size on ucs4 builds"""
+	if type(value) is unicode:
+		try:
+			return value.encode('ascii')
+		except UnicodeError:
+			pass
+	return value
+
+
+def _intern(value):
+	"""one shared copy of a string that repeats across records (slugs, statuses, field names)"""
+	value = _compact(value)
+	if type(value) is str or type(value) is unicode:
+		return _interned.setdefault(value, value)
+	return value
+
+
+def _parse_date(value):
+	"""'2014-05-12 23:00:00' as a datetime.  anything else is kept as is"""
+	if isinstance(value, basestring):
+		m = _DATE.match(value)
+		if m is not None:
+			try:
+				return datetime.datetime(*[int(part) for part in m.groups()])
+			except ValueError:
+				pass
+	return _compact(value)
+
+
+def _compact_template_data(value):
+	if isinstance(value, dict):
+		return dict((_intern(field), _compact(field_value)) for field, field_value in value.iteritems())
+	return value
+
+
+class Record(object):
+	"""
+	base of the typed record models returned when a list call is made with
+	`model`.  known fields are stored in __slots__ and read as attributes
+	(a field the server didn't send reads as None); anything else the
+	server sends is kept in `extra`.  strings that repeat across records
+	are shared, ascii text is stored as str, and dates become datetime
+	objects.  to_dict() gives back the record as the server sent it.
+
+	records also answer record['field'] and record.get('field'), so code
+	written against plain dicts keeps working.
+	"""
+	__slots__ = ('extra',)
+	fields = ()
+	_known = frozenset()
+	_loaders = {}
+	interned_fields = ('status', 'site_slug', 'timezone')
+	date_fields = ('date',)
+
+	def __init__(self, data):
+		known = self._known
+		load = self._loaders
+		extra = None
+		for key, value in (data.iteritems() if hasattr(data, 'iteritems') else data.items()):
+			if key in known:
+				loader = load.get(key)
+				setattr(self, key, loader(value) if loader is not None and value is not None else _compact(value))
+			else:
+				if extra is None:
+					extra = {}
+				extra[_intern(key)] = value
+		self.extra = extra
+
+	def __getattr__(self, name):
+		# only reached for slots that were never set
+		if name in self._known:
+			return None
+		raise AttributeError(name)
+
+	def __getitem__(self, key):
+		if key in self._known:
+			try:
+				return object.__getattribute__(self, key)
+			except AttributeError:
+				pass
+		elif self.extra is not None and key in self.extra:
+			return self.extra[key]
+		raise KeyError(key)
+
+	def get(self, key, default = None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def __contains__(self, key):
+		try:
+			self[key]
+		except KeyError:
+			return False
+		return True
+
+	def to_dict(self):
+		result = {}
+		for field in self.fields:
+			try:
+				value = object.__getattribute__(self, field)
+			except AttributeError:
+				continue
+			if isinstance(value, datetime.datetime):
+				value = value.strftime(_DATE_FORMAT)
+			result[field] = value
+		if self.extra:
+			result.update(self.extra)
+		return result
+
+	def __repr__(self):
+		return '<{0} id={1!r} title={2!r}>'.format(type(self).__name__, self.get('id'), self.get('title'))
+
+
+def _record_model(cls):
+	"""fills in the lookup tables of a Record subclass"""
+	cls._known = frozenset(cls.fields)
+	loaders = {}
+	for field in cls.interned_fields:
+		loaders[field] = _intern
+	for field in cls.date_fields:
+		loaders[field] = _parse_date
+	for field in ('template_data', 'data'):
+		loaders[field] = _compact_template_data
+	cls._loaders = dict((field, loader) for field, loader in loaders.iteritems() if field in cls._known)
+	return cls
+
+
+@_record_model
+class Broadcast(Record):
+	fields = ('id', 'title', 'description', 'status', 'date', 'timezone', 'site_slug', 'section_id', 'embed_code', 'template_data')
+	__slots__ = fields
+
+
+@_record_model
+class Videoclip(Record):
+	fields = ('id', 'title', 'description', 'status', 'date', 'site_slug', 'section_id', 'embed_code', 'template_data')
+	__slots__ = fields
+
+
+@_record_model
+class Playlist(Record):
+	fields = ('id', 'title', 'description', 'available', 'date', 'site_slug', 'section_id')
+	__slots__ = fields
+
+
+@_record_model
+class Section(Record):
+	fields = ('id', 'title', 'description', 'date', 'site_slug')
+	__slots__ = fields
+
+
+@_record_model
+class Template(Record):
+	fields = ('id', 'title', 'description', 'date', 'site_slug', 'section_id', 'data')
+	__slots__ = fields
+
+
+# list call => record model used for model = True
+RECORD_MODELS = {
+	'broadcasts' : Broadcast,
+	'videoclips' : Videoclip,
+	'playlists' : Playlist,
+	'sections' : Section,
+	'templates' : Template
+}
+
+
+def _model_class(list_name, model):
+	"""Record class asked for by a `model` argument, or None"""
+	if not model:
+		return None
+	if model is True:
+		if list_name not in RECORD_MODELS:
+			raise ValueError("there is no record model for {0}".format(list_name))
+		return RECORD_MODELS[list_name]
+	return model
+
+
+class UploadJournal(object):
+	"""
+	small on-disk record of a multipart upload in progress: the result of
+	the s3 handshake, the storage upload id and the parts already sent.
+	it lets a later Volar.upload_file call for the same file carry on from
+	where an interrupted one stopped.  journals of uploads started more
+	than ttl seconds ago are ignored and swept away, however recently
+	parts were added: the handshake they hold expires all the same.
+	"""
+	def __init__(self, path, ttl):
+		self.path = path
+		self.ttl = ttl
+		self._lock = threading.Lock()
+		self.reset()
+		try:
+			with open(path, 'rb') as fp:
+				state = json.load(fp)
+			if time.time() - state['created'] < ttl:
+				self.created = state['created']
+				self.handshake = state['handshake']
+				self.upload_id = state['upload_id']
+				self.part_size = state['part_size']
+				self.parts = set(state['parts'])
+		except (OSError, IOError, ValueError, KeyError, TypeError):
+			self.reset()
+
+	@classmethod
+	def for_file(cls, directory, file_path, key, ttl):
+		"""journal for uploading file_path on behalf of key (ex. the broadcast it will be archived to)"""
+		cls.sweep(directory, ttl)
+		stat = os.stat(file_path)
+		name = hashlib.sha1("{0}|{1}|{2}|{3}".format(os.path.abspath(file_path), stat.st_size, stat.st_mtime, key)).hexdigest()
+		return cls(os.path.join(directory, name + '.json'), ttl)
+
+	@staticmethod
+	def sweep(directory, ttl):
+		"""removes journals that have expired"""
+		try:
+			names = os.listdir(directory)
+		except OSError:
+			return
+		now = time.time()
+		for name in names:
+			if not name.endswith('.json'):
+				continue
+			path = os.path.join(directory, name)
+			try:
+				# saving a journal moves its mtime on, so it is only a lower bound
+				if now - os.path.getmtime(path) < ttl:
+					with open(path, 'rb') as fp:
+						if now - json.load(fp)['created'] < ttl:
+							continue
+				os.remove(path)
+			except (OSError, IOError, ValueError, KeyError, TypeError):
+				pass
+
+	def reset(self):
+		self.created = time.time()
+		self.handshake = None
+		self.upload_id = None
+		self.part_size = None
+		self.parts = set()
+
+	def start(self, handshake, upload_id, part_size):
+		self.reset()
+		self.handshake = handshake
+		self.upload_id = upload_id
+		self.part_size = part_size
+		self.save()
+
+	def part_done(self, part_num):
+		with self._lock:
+			self.parts.add(part_num)
+			self.save()
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		tmp_path = "{0}.{1}.tmp".format(self.path, os.getpid())
+		with open(tmp_path, 'wb') as fp:
+			json.dump({
+				'created' : self.created,
+				'handshake' : self.handshake,
+				'upload_id' : self.upload_id,
+				'part_size' : self.part_size,
+				'parts' : sorted(self.parts)
+			}, fp)
+		os.rename(tmp_path, self.path)
+
+	def remove(self):
+		self.reset()
+		try:
+			os.remove(self.path)
+		except OSError:
+			pass
+
+
+class UploadIndex(object):
+	"""
+	local index of files already uploaded through Volar.upload_file, so
+	that uploading the same content again (ex. the same poster attached to
+	many broadcasts) can reuse the earlier tmp_file_id / tmp_file_name
+	instead of sending the bytes again.  entries are trusted for ttl
+	seconds, which should be less than the time the server keeps
+	temporary files around.
+
+	uploads are keyed by the md5 of their content.  for single part
+	uploads the md5 is the same checksum boto computes for the upload
+	anyway, so it costs no extra read of the file.  large (multipart)
+	files are read once more to hash them before they are sent; with
+	hash_large = False they are keyed on their path, size and modification
+	time instead, and so are never matched with a copy of the same
+	content under another path.  paths are always remembered along with
+	their size and modification time, so a file that hasn't changed is
+	recognized without being read at all.
+
+	streamed uploads are hashed as they are read.  one that fits in a
+	single part is looked up before it is sent; a longer one can only be
+	recorded once it has been sent, for later uploads of the same content
+	to match.
+
+	the index is a sqlite database and can be shared by several processes.
+
+	>>>	v.upload_index = volar.UploadIndex('/var/cache/volar/uploads.db')
+	"""
+	def __init__(self, path, ttl = 3600, hash_large = True):
+		self.path = path
+		self.ttl = ttl
+		self.hash_large = hash_large
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, timeout = 30, check_same_thread = False)
+		with self._lock:
+			self._db.execute('CREATE TABLE IF NOT EXISTS uploads (digest TEXT PRIMARY KEY, tmp_file_id, tmp_file_name TEXT, bytes INTEGER, created REAL)')
+			self._db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, digest TEXT)')
+			self._db.commit()
+
+	@staticmethod
+	def stat_digest(file_path, stat):
+		"""key used for uploads that were not hashed"""
+		return 'stat:' + hashlib.sha1("{0}|{1}|{2}".format(os.path.abspath(file_path), stat.st_size, stat.st_mtime)).hexdigest()
+
+	def lookup(self, digest):
+		"""gets a still valid upload of content with the given digest, or None"""
+		with self._lock:
+			row = self._db.execute('SELECT tmp_file_id, tmp_file_name, bytes FROM uploads WHERE digest = ? AND created > ?', (digest, time.time() - self.ttl)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+		return { 'tmp_file_id' : row[0], 'tmp_file_name' : row[1], 'bytes_uploaded' : row[2] }
+
+	def lookup_file(self, file_path, stat):
+		"""gets a still valid upload of an unchanged file, or None"""
+		with self._lock:
+			row = self._db.execute('SELECT digest FROM files WHERE path = ? AND size = ? AND mtime = ?', (os.path.abspath(file_path), stat.st_size, stat.st_mtime)).fetchone()
+		if row is None:
+			return None
+		return self.lookup(row[0])
+
+	def remember_file(self, file_path, stat, digest):
+		with self._lock:
+			self._db.execute('INSERT OR REPLACE INTO files (path, size, mtime, digest) VALUES (?, ?, ?, ?)', (os.path.abspath(file_path), stat.st_size, stat.st_mtime, digest))
+			self._db.commit()
+
+	def record(self, digest, upload):
+		"""remembers the result of an upload_file call"""
+		with self._lock:
+			self._db.execute('INSERT OR REPLACE INTO uploads (digest, tmp_file_id, tmp_file_name, bytes, created) VALUES (?, ?, ?, ?, ?)', (digest, upload['tmp_file_id'], upload['tmp_file_name'], upload['bytes_uploaded'], time.time()))
+			self._db.execute('DELETE FROM uploads WHERE created <= ?', (time.time() - self.ttl, ))
+			self._db.commit()
+
+
+class _StaleUpload(Exception):
+	pass
+
+
+def _cancel_upload(mp):
+	"""aborts a multipart upload that won't be completed, so storage drops its parts"""
+	try:
+		mp.cancel_upload()
+	except Exception:
+		# the error that led here is the one worth reporting
+		pass
+
+
+def _archive_journal_key(kind, params):
+	return '{0}:{1}:{2}'.format(kind, params.get('site'), params.get('id'))
+
+
+class S3ConnectionCache(object):
+	"""
+	keeps storage connections open between uploads.  boto connections
+	must not be used by two threads at once, so each is checked out for
+	the length of a transfer and checked back in when it is done, ready
+	for the next upload (or part) with the same bucket and credentials,
+	whichever thread sends it.  idle connections are reused until the
+	temporary token they were opened with is within refresh_margin seconds
+	of expiring.  if the s3 handshake doesn't say when its token expires,
+	it is assumed to be valid for token_lifetime seconds after it was
+	first seen.
+
+	>>>	bucket = cache.checkout(handshakeRes)
+	>>>	try:
+			...
+		finally:
+			cache.checkin(handshakeRes, bucket)
+	"""
+	def __init__(self, token_lifetime = 900, refresh_margin = 60):
+		self.token_lifetime = token_lifetime
+		self.refresh_margin = refresh_margin
+		self.hits = 0
+		self.misses = 0
+		self._idle = {}
+		self._expires = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _key(handshakeRes):
+		return (handshakeRes['bucket'], handshakeRes['access_key'], handshakeRes['secret'], handshakeRes['token'])
+
+	def _sweep(self, now):
+		for stale in [key for key, expires in self._expires.iteritems() if expires - self.refresh_margin <= now]:
+			del self._expires[stale]
+			self._idle.pop(stale, None)
+
+	def checkout(self, handshakeRes):
+		"""
+		gets a bucket object for the storage described by an s3 handshake,
+		for the calling thread's use only until it is checked in
+		"""
+		key = self._key(handshakeRes)
+		now = time.time()
+		with self._lock:
+			self._sweep(now)
+			idle = self._idle.get(key)
+			if idle:
+				self.hits += 1
+				return idle.pop()
+			self.misses += 1
+			if key not in self._expires:
+				expires = self._expiration(handshakeRes.get('expiration'))
+				self._expires[key] = expires if expires is not None else now + self.token_lifetime
+
+		connection = S3Connection(aws_access_key_id=handshakeRes['access_key'], aws_secret_access_key=handshakeRes['secret'], security_token=handshakeRes['token'])
+		return S3Bucket(connection = connection, name = handshakeRes['bucket'])
+
+	def checkin(self, handshakeRes, bucket):
+		"""returns a bucket from checkout() for reuse"""
+		key = self._key(handshakeRes)
+		with self._lock:
+			self._sweep(time.time())
+			if key in self._expires:
+				self._idle.setdefault(key, []).append(bucket)
+
+	def clear(self):
+		with self._lock:
+			self._idle.clear()
+			self._expires.clear()
+
+	@staticmethod
+	def _expiration(value):
+		if value is None:
+			return None
+		try:
+			return float(value)
+		except (TypeError, ValueError):
+			pass
+		try:
+			return calendar.timegm(time.strptime(str(value)[:19], '%Y-%m-%dT%H:%M:%S'))
+		except ValueError:
+			return None
+
+
+class _TokenBucket(object):
+	"""
+	thread-safe token bucket.  take(n) blocks the calling thread until n
+	tokens can be spent without going over `rate` tokens per second.
+	"""
+	def __init__(self, rate, capacity = None):
+		self.rate = float(rate)
+		self.capacity = float(capacity or rate)
+		self.tokens = self.capacity
+		self.stamp = time.time()
+		self._lock = threading.Lock()
+
+	def take(self, n = 1):
+		with self._lock:
+			now = time.time()
+			self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+			self.stamp = now
+			self.tokens -= n
+			wait = -self.tokens / self.rate if self.tokens < 0 else 0
+		if wait > 0:
+			time.sleep(wait)
+
+	def set_rate(self, rate):
+		"""changes the refill rate.  tokens earned so far are kept"""
+		with self._lock:
+			now = time.time()
+			self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+			self.stamp = now
+			self.rate = float(rate)
+
+
+class _IterReader(object):
+	"""file-like .read() over an iterable of byte strings"""
+	def __init__(self, iterable):
+		self._chunks = iter(iterable)
+		self._buf = ''
+
+	def read(self, size = -1):
+		while size < 0 or len(self._buf) < size:
+			try:
+				self._buf += next(self._chunks)
+			except StopIteration:
+				break
+		if size < 0:
+			data, self._buf = self._buf, ''
+		else:
+			data, self._buf = self._buf[:size], self._buf[size:]
+		return data
+
+
+def _read_full(fp, size):
+	"""reads size bytes from fp, or fewer only at end of stream"""
+	chunks = []
+	remaining = size
+	while remaining > 0:
+		chunk = fp.read(remaining)
+		if not chunk:
+			break
+		chunks.append(chunk)
+		remaining -= len(chunk)
+	return ''.join(chunks)
+
+
+def _progress_cb(progress):
+	"""adapts a progress(bytes_just_sent) function to boto's cumulative cb(bytes_sent, total)"""
+	state = { 'sent' : 0 }
+	def cb(sent, total):
+		if sent < state['sent']:
+			state['sent'] = 0
+		delta = sent - state['sent']
+		state['sent'] = sent
+		if delta > 0:
+			progress(delta)
+	return cb
+
+
+class TransportStats(object):
+	"""
+	thread-safe counters describing how well the connection pool of a
+	VolarTransport is being reused.  every request checks a connection out
+	of the pool; a 'miss' is counted each time that connection has to
+	(re)open a socket to the server, everything else is a 'hit'.  retries
+	and circuit breaker activity are counted here as well.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.requests = 0
+		self.misses = 0
+		self.retries = 0
+		self.circuit_trips = 0
+		self.circuit_rejections = 0
+
+	def record_checkout(self):
+		with self._lock:
+			self.requests += 1
+
+	def record_connect(self):
+		with self._lock:
+			self.misses += 1
+
+	def record_retry(self):
+		with self._lock:
+			self.retries += 1
+
+	def record_trip(self):
+		with self._lock:
+			self.circuit_trips += 1
+
+	def record_rejection(self):
+		with self._lock:
+			self.circuit_rejections += 1
+
+	@property
+	def hits(self):
+		return max(self.requests - self.misses, 0)
+
+	def as_dict(self):
+		with self._lock:
+			return {
+				'requests' : self.requests,
+				'hits' : max(self.requests - self.misses, 0),
+				'misses' : self.misses,
+				'retries' : self.retries,
+				'circuit_trips' : self.circuit_trips,
+				'circuit_rejections' : self.circuit_rejections
+			}
+
+
+# seconds the current thread has spent opening connections, read by
+# Volar.request to time the connect phase for observers
+_connect_time = threading.local()
+
+
+def _connect_seconds():
+	return getattr(_connect_time, 'total', 0.0)
+
+
+def _counting_pool_class(base, stats):
+	"""builds a subclass of the given urllib3 pool class that reports to stats"""
+	class CountingConnection(base.ConnectionCls):
+		def connect(self):
+			stats.record_connect()
+			started = time.time()
+			try:
+				return super(CountingConnection, self).connect()
+			finally:
+				_connect_time.total = _connect_seconds() + time.time() - started
+
+	class CountingPool(base):
+		ConnectionCls = CountingConnection
+
+		def _get_conn(self, timeout = None):
+			stats.record_checkout()
+			return super(CountingPool, self)._get_conn(timeout)
+
+	return CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+	def __init__(self, stats, **kwargs):
+		self.stats = stats
+		super(_CountingAdapter, self).__init__(**kwargs)
+
+	def init_poolmanager(self, *args, **kwargs):
+		super(_CountingAdapter, self).init_poolmanager(*args, **kwargs)
+		self.poolmanager.pool_classes_by_scheme = {
+			'http' : _counting_pool_class(HTTPConnectionPool, self.stats),
+			'https' : _counting_pool_class(HTTPSConnectionPool, self.stats)
+		}
+
+
+def _val_to_str(val):
+	if isinstance(val, bool):
+		if val:
+			return '1'
+		else:
+			return '0'
+	else:
+		return str(val)
+
+
+_SIGNED_SCALARS = frozenset([str, unicode, int, long, float])
+
+
+class RequestSigner(object):
+	"""
+	computes request signatures, byte for byte the same as
+	Volar.build_signature, but with less work per request: the hash state
+	for secret + method + route is computed once per route and copied, and
+	the parameters are canonicalized in a single sorted pass whose output
+	is shared by the signature and the query string.
+	"""
+	def __init__(self, secret):
+		self.secret = str(secret)
+		self._prefixes = {}
+
+	def _prefix(self, method, route):
+		key = (method, route)
+		prefix = self._prefixes.get(key)
+		if prefix is None:
+			prefix = hashlib.sha256((self.secret + method.upper() + route.strip('/')).encode('ascii'))
+			self._prefixes[key] = prefix
+		return prefix
+
+	@staticmethod
+	def canonicalize(params):
+		"""
+		single pass over params (already flattened by Volar.request)
+
+		Returns:
+			tuple of (list of (key, value) query string pairs, sorted by
+			key, and the string those params contribute to the signature)
+		"""
+		pairs = sorted(params.iteritems())
+		parts = []
+		append = parts.append
+		scalars = _SIGNED_SCALARS
+		for key, value in pairs:
+			cls = type(value)
+			if cls in scalars:
+				# '%s' formats these types exactly like str() does
+				append('%s=%s' % (key, value))
+			elif cls is bool:
+				append(key + ('=1' if value else '=0'))
+			elif isinstance(value, dict):
+				for v_key, v_value in sorted(value.iteritems()):
+					append(key + '[' + _val_to_str(v_key) + ']=' + _val_to_str(v_value))
+			elif isinstance(value, (list, tuple)):
+				for v_key, v_value in enumerate(value):
+					append(key + '[' + _val_to_str(v_key) + ']=' + _val_to_str(v_value))
+			else:
+				append(key + '=' + _val_to_str(value))
+		return pairs, ''.join(parts)
+
+	def sign(self, method, route, canonical, post_body = None):
+		"""signature for a request whose params canonicalize to `canonical`"""
+		if method == '':
+			method = 'GET'
+		digest = self._prefix(method, route).copy()
+		digest.update(canonical.encode('ascii'))
+		if type(post_body) is str:
+			digest.update(post_body)
+		return base64.b64encode(digest.digest())[0:43].rstrip('=')
+
+
+class CircuitOpenError(VolarError):
+	"""raised by VolarTransport when the circuit breaker for a host is open"""
+	pass
+
+
+class RetryPolicy(object):
+	"""
+	decides whether, and how long after, a failed idempotent request is
+	sent again.  delays grow exponentially (backoff, 2 * backoff,
+	4 * backoff, ...) up to max_backoff, with 'full jitter' so that many
+	clients failing at once don't retry in lock step.  a Retry-After header
+	sent by the server is honored instead of the computed delay.
+
+	Args:
+		retries (int): number of times a request is retried
+		backoff (float): base delay in seconds
+		max_backoff (float): upper bound of a computed delay
+		max_retry_after (float): longest Retry-After that is waited out.
+		  if the server asks for a longer pause, the response is returned
+		  as is
+		statuses (tuple): http status codes that are retried
+		jitter (bool): randomize delays
+	"""
+	def __init__(self, retries = 3, backoff = 0.5, max_backoff = 30, max_retry_after = 120, statuses = (429, 500, 502, 503, 504), jitter = True):
+		self.retries = retries
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.max_retry_after = max_retry_after
+		self.statuses = frozenset(statuses)
+		self.jitter = jitter
+
+	def retry_after(self, response):
+		"""seconds asked for by the response's Retry-After header, or None"""
+		value = response.headers.get('Retry-After') if response is not None else None
+		if not value:
+			return None
+		value = value.strip()
+		if value.isdigit():
+			return float(value)
+		parsed = email.utils.parsedate_tz(value)
+		if parsed is None:
+			return None
+		return max(email.utils.mktime_tz(parsed) - time.time(), 0.0)
+
+	def delay(self, attempt, response = None):
+		"""
+		seconds to wait before retry number `attempt` (starting at 0), or
+		None if the request should not be retried
+		"""
+		if attempt >= self.retries:
+			return None
+		wait = self.retry_after(response)
+		if wait is not None:
+			return wait if wait <= self.max_retry_after else None
+		wait = min(self.max_backoff, self.backoff * (2 ** attempt))
+		if self.jitter:
+			wait = random.uniform(0, wait)
+		return wait
+
+
+class CircuitBreaker(object):
+	"""
+	per host circuit breaker.  after `failure_threshold` consecutive
+	failures (connection errors, timeouts or 5xx responses) the circuit for
+	that host opens and requests fail immediately with CircuitOpenError
+	instead of piling onto a degraded server.  once `reset_timeout` seconds
+	have passed a single trial request is let through; if it succeeds the
+	circuit closes again, otherwise it stays open for another
+	reset_timeout.
+
+	Args:
+		failure_threshold (int): consecutive failures that open the circuit
+		reset_timeout (float): seconds the circuit stays open
+	"""
+	def __init__(self, failure_threshold = 5, reset_timeout = 30):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self._lock = threading.Lock()
+		self._hosts = {}	# host => [consecutive failures, open until, trial in flight]
+
+	def allow(self, host):
+		"""True if a request to host may be sent now"""
+		with self._lock:
+			state = self._hosts.get(host)
+			if state is None or state[1] is None:
+				return True
+			if state[2] or time.time() < state[1]:
+				return False
+			state[2] = True	# half open, let one request through
+			return True
+
+	def record_success(self, host):
+		with self._lock:
+			self._hosts.pop(host, None)
+
+	def record_failure(self, host):
+		"""
+		counts a failed request.  returns True if this failure opened the
+		circuit
+		"""
+		with self._lock:
+			state = self._hosts.setdefault(host, [0, None, False])
+			state[0] += 1
+			if state[2] or (state[1] is None and state[0] >= self.failure_threshold):
+				state[1] = time.time() + self.reset_timeout
+				state[2] = False
+				return True
+			return False
+
+	def abandon(self, host):
+		"""
+		a request let through by allow() ended without an outcome.  if it
+		was the half open trial, the next request may try instead
+		"""
+		with self._lock:
+			state = self._hosts.get(host)
+			if state is not None:
+				state[2] = False
+
+	def state(self, host):
+		"""'closed', 'open' or 'half-open'"""
+		with self._lock:
+			state = self._hosts.get(host)
+			if state is None or state[1] is None:
+				return 'closed'
+			if state[2] or time.time() >= state[1]:
+				return 'half-open'
+			return 'open'
+
+
+class _FairSemaphore(object):
+	"""
+	counting semaphore that hands free slots to waiting threads strictly in
+	the order they started waiting
+	"""
+	def __init__(self, value):
+		self.value = value
+		self._lock = threading.Lock()
+		self._waiters = deque()
+
+	def acquire(self):
+		with self._lock:
+			if self.value > 0 and not self._waiters:
+				self.value -= 1
+				return
+			waiter = threading.Lock()
+			waiter.acquire()
+			self._waiters.append(waiter)
+		waiter.acquire()	# released by the release() that hands us its slot
+
+	def release(self):
+		with self._lock:
+			if self._waiters:
+				self._waiters.popleft().release()
+			else:
+				self.value += 1
+
+
+class RateLimit(object):
+	"""
+	paces one family of requests: at most `rate` requests per second
+	(bursts of up to `burst`), and at most `max_in_flight` requests waiting
+	on the server at once.  callers queue first come, first served.
+
+	if `adaptive` is set, the rate is halved (down to min_rate) whenever
+	the server answers 429 Too Many Requests or 503 Service Unavailable,
+	at most once per `cooldown` seconds, and every successful response
+	afterwards wins back `recovery` * rate until the configured rate is
+	reached again.
+
+	Args:
+		rate (float): requests per second.  None does not limit the rate
+		burst (int): requests that may be sent back to back after an idle
+		  period.  defaults to rate
+		max_in_flight (int): concurrent requests.  None does not limit them.
+		  a streamed response (ex. a ListStream) holds its slot until its
+		  body has been read or it is closed
+		adaptive (bool): slow down when the server throttles.  only has an
+		  effect if rate is set
+		min_rate (float): lowest rate adaptation goes down to
+		recovery (float): fraction of rate regained per successful response
+		cooldown (float): seconds between two slow downs
+	"""
+	THROTTLE_STATUSES = (429, 503)
+
+	def __init__(self, rate = None, burst = None, max_in_flight = None, adaptive = True, min_rate = 0.5, recovery = 0.01, cooldown = 1.0):
+		self.max_rate = float(rate) if rate else None
+		self.rate = self.max_rate
+		self.adaptive = adaptive
+		self.min_rate = min(min_rate, self.max_rate) if self.max_rate else min_rate
+		self.recovery = recovery
+		self.cooldown = cooldown
+		self.throttled = 0
+		self._bucket = _TokenBucket(rate, burst) if rate else None
+		self._slots = _FairSemaphore(max_in_flight) if max_in_flight else None
+		self._lock = threading.Lock()
+		self._slowed_at = 0
+
+	def acquire(self):
+		"""blocks until a request may be sent"""
+		if self._slots is not None:
+			self._slots.acquire()
+		if self._bucket is not None:
+			self._bucket.take()
+
+	def release(self, status_code = None):
+		"""marks a request as finished.  status_code is None if it failed without a response"""
+		if self._slots is not None:
+			self._slots.release()
+		if status_code is None:
+			return
+		throttled = status_code in self.THROTTLE_STATUSES
+		if throttled:
+			with self._lock:
+				self.throttled += 1
+		if not self.adaptive or self._bucket is None:
+			return
+		with self._lock:
+			if throttled:
+				now = time.time()
+				if now - self._slowed_at < self.cooldown:
+					return
+				self._slowed_at = now
+				rate = max(self.min_rate, self.rate / 2)
+			elif status_code < 400 and self.rate < self.max_rate:
+				rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+			else:
+				return
+			self.rate = rate
+		self._bucket.set_rate(rate)
+
+
+class RateLimiter(object):
+	"""
+	per route family RateLimits for a Volar instance.  requests are sorted
+	into three families:
+
+	  - 'list' : list reads (Volar.broadcasts, Volar.sites, ...)
+	  - 's3handshake' : upload handshakes
+	  - 'mutation' : everything else (create, update, delete, archive, ...)
+
+	a family without a RateLimit is not limited.
+
+	>>>	v.rate_limiter = RateLimiter(
+			list = RateLimit(rate = 20, max_in_flight = 8),
+			mutation = RateLimit(rate = 5, max_in_flight = 2)
+		)
+	"""
+	def __init__(self, list = None, mutation = None, s3handshake = None):
+		self.limits = {'list' : list, 'mutation' : mutation, 's3handshake' : s3handshake}
+
+	@staticmethod
+	def family(route, method):
+		route = route.strip('/')
+		if method == 'GET' and route in LIST_ROUTES.values():
+			return 'list'
+		if route.endswith('s3handshake'):
+			return 's3handshake'
+		return 'mutation'
+
+	def for_route(self, route, method):
+		"""RateLimit governing a request, or None"""
+		return self.limits.get(self.family(route, method))
+
+	def stats(self):
+		"""
+		Returns:
+			dict
+			 |	{
+			 |		family : {
+			 |			'rate' : current requests per second (None if unlimited),
+			 |			'throttled' : throttling responses seen so far
+			 |		},
+			 |		...
+			 |	}
+		"""
+		return dict((name, {'rate' : limit.rate, 'throttled' : limit.throttled}) for name, limit in self.limits.iteritems() if limit is not None)
+
+
+def _release_when_done(r, release):
+	"""
+	arranges for release() to be called once the streamed response r has
+	been read to the end or closed, which is when urllib3 hands its
+	connection back to the pool.  returns False, having done nothing, if r
+	has no pooled connection to watch
+	"""
+	raw = r.raw
+	release_conn = getattr(raw, 'release_conn', None)
+	if release_conn is None:
+		return False
+	lock = threading.Lock()
+	pending = [True]
+
+	def release_conn_once():
+		try:
+			release_conn()
+		finally:
+			with lock:
+				first = pending[0]
+				pending[0] = False
+			if first:
+				release()
+
+	raw.release_conn = release_conn_once
+	return True
+
+
+class VolarTransport(object):
+	"""
+	persistent, pooled http transport used by Volar.request.  connections to
+	the cms are kept alive and reused between calls instead of paying for a
+	new tcp (and tls) handshake on every request.  a single transport may be
+	shared by any number of threads.
+
+	Args:
+		pool_connections (int): number of per-host connection pools to keep
+		pool_maxsize (int): maximum number of connections kept open to a
+		  single host
+		pool_block (bool): if True, threads wait for a free connection when
+		  pool_maxsize connections are already in use instead of opening
+		  an extra, throw-away connection
+		keep_alive (bool): if False, connections are closed after every
+		  request
+		timeout (float or tuple): seconds to wait for the server.  either a
+		  single value, or a (connect timeout, read timeout) tuple.  None
+		  waits forever
+		retry (RetryPolicy): how idempotent requests are retried.  None
+		  never retries
+		circuit_breaker (CircuitBreaker): fails requests fast while a host
+		  keeps failing.  None disables it
+	"""
+	def __init__(self, pool_connections = 10, pool_maxsize = 10, pool_block = False, keep_alive = True, timeout = None, retry = None, circuit_breaker = None):
+		self.timeout = timeout
+		self.retry = retry
+		self.circuit_breaker = circuit_breaker
+		self.stats = TransportStats()
+		self.session = requests.Session()
+		adapter = _CountingAdapter(self.stats, pool_connections = pool_connections, pool_maxsize = pool_maxsize, pool_block = pool_block)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+		if not keep_alive:
+			self.session.headers['Connection'] = 'close'
+
+	def send(self, method, url, params = None, data = None, files = None, headers = None, idempotent = False, limit = None, stream = False):
+		"""
+		sends a request.  only requests flagged idempotent are retried;
+		every request goes through the circuit breaker, if there is one.
+		once retries run out the last response is returned (or the last
+		error raised) as is.  if a RateLimit is given, every attempt waits
+		for its turn.  with stream, the body is left unread until the
+		caller reads it.
+		"""
+		retry = self.retry if idempotent else None
+		breaker = self.circuit_breaker
+		if retry is None and breaker is None:
+			return self._send_once(limit, method, url, params = params, data = data, files = files, headers = headers, timeout = self.timeout, stream = stream)
+
+		host = urlparse.urlsplit(url).netloc
+		attempt = 0
+		while True:
+			if breaker is not None and not breaker.allow(host):
+				self.stats.record_rejection()
+				raise CircuitOpenError("circuit breaker for " + host + " is open, too many recent failures")
+			try:
+				r = self._send_once(limit, method, url, params = params, data = data, files = files, headers = headers, timeout = self.timeout, stream = stream)
+			except requests.RequestException as e:
+				if breaker is not None and breaker.record_failure(host):
+					self.stats.record_trip()
+				transient = isinstance(e, (requests.ConnectionError, requests.Timeout))
+				wait = retry.delay(attempt) if retry is not None and transient else None
+				if wait is None:
+					raise
+			except Exception:
+				# urllib3 / socket errors, rate limiter failures, ...
+				if breaker is not None and breaker.record_failure(host):
+					self.stats.record_trip()
+				raise
+			except BaseException:
+				# interrupted - no outcome, but a half open trial must not stay pending
+				if breaker is not None:
+					breaker.abandon(host)
+				raise
+			else:
+				if breaker is not None:
+					if r.status_code >= 500:
+						if breaker.record_failure(host):
+							self.stats.record_trip()
+					else:
+						breaker.record_success(host)
+				if retry is None or r.status_code not in retry.statuses:
+					return r
+				wait = retry.delay(attempt, r)
+				if wait is None:
+					return r
+				r.close()
+			self.stats.record_retry()
+			attempt += 1
+			time.sleep(wait)
+
+	def _send_once(self, limit, method, url, **kwargs):
+		if limit is None:
+			return self.session.request(method, url, **kwargs)
+		limit.acquire()
+		status_code = None
+		held = False
+		try:
+			r = self.session.request(method, url, **kwargs)
+			status_code = r.status_code
+			if kwargs.get('stream'):
+				# the body is still to be downloaded - it counts as in flight
+				held = _release_when_done(r, lambda: limit.release(status_code))
+			return r
+		finally:
+			if not held:
+				limit.release(status_code)
+
+	def close(self):
+		self.session.close()
+
+
+class RequestEvent(object):
+	"""
+	what a VolarObserver is told about one call to Volar.request.  times
+	are in seconds; a phase that did not happen is 0, one that could not
+	be timed is None.
+
+	  - route, method, status : the call and the http status of the answer
+	    (None if there was none)
+	  - bytes_out, bytes_in : size of the request and response bodies.
+	    bytes_in is None for streamed responses
+	  - sign : building and signing the query
+	  - connect : opening connections to the server (0 if a pooled
+	    connection was reused)
+	  - wait : from sending the request until the response headers arrived,
+	    minus connect.  for retried requests, of the last attempt only
+	  - download : reading the response body.  None for streamed responses,
+	    which are read as they are iterated
+	  - decode : json decoding
+	  - total : everything, including retries and rate limiting
+	  - cached : answered from Volar.cache without a request
+	  - error : Volar.error if the call failed, otherwise None
+	"""
+	__slots__ = ('route', 'method', 'status', 'bytes_out', 'bytes_in', 'sign', 'connect', 'wait', 'download', 'decode', 'total', 'cached', 'error', 'started')
+
+	def __init__(self, route, method):
+		self.route = route
+		self.method = method
+		self.status = self.bytes_in = self.error = None
+		self.bytes_out = 0
+		self.sign = self.connect = self.wait = self.download = self.decode = self.total = 0.0
+		self.cached = False
+		self.started = time.time()
+
+	def __repr__(self):
+		return '<RequestEvent {0} {1} {2}>'.format(self.method, self.route, self.status)
+
+
+def _time_response(event, r, connect_before, read_body):
+	"""fills in the transfer timings of event.  reads the body of r unless read_body is False"""
+	event.status = r.status_code
+	event.connect = _connect_seconds() - connect_before
+	event.wait = max(r.elapsed.total_seconds() - event.connect, 0.0)
+	body = r.request.body
+	if isinstance(body, basestring):
+		event.bytes_out = len(body)
+	if read_body:
+		started = time.time()
+		event.bytes_in = len(r.content)
+		event.download = time.time() - started
+	else:
+		event.download = None
+
+
+class UploadEvent(object):
+	"""
+	what a VolarObserver is told about one call to Volar.upload_file.
+	times are in seconds.
+
+	  - file_name : name reported to the server
+	  - bytes : bytes sent to storage
+	  - multipart : True if the file went up as a multipart upload
+	  - deduplicated : True if Volar.upload_index found the content had
+	    already been uploaded, and nothing was sent
+	  - handshake : the s3handshake call (0 if resumed from a journal)
+	  - setup : getting a storage connection from Volar.s3_connections.
+	    boto connects lazily, so the tcp / tls handshake with storage is
+	    part of transfer
+	  - transfer : sending the content, including connecting to storage
+	  - total : everything
+	  - error : Volar.error if the upload failed, otherwise None
+	"""
+	__slots__ = ('file_name', 'bytes', 'multipart', 'deduplicated', 'handshake', 'setup', 'transfer', 'total', 'error', 'started')
+
+	def __init__(self, file_name):
+		self.file_name = file_name
+		self.bytes = 0
+		self.multipart = self.deduplicated = False
+		self.handshake = self.setup = self.transfer = self.total = 0.0
+		self.error = None
+		self.started = time.time()
+
+	def __repr__(self):
+		return '<UploadEvent {0} {1} bytes>'.format(self.file_name, self.bytes)
+
+
+class VolarObserver(object):
+	"""
+	instrumentation hooks.  set Volar.observer to an instance of a
+	subclass that overrides the hooks it needs.  without an observer the
+	client takes no timings at all.
+
+	hooks are called on the thread making the call, so with AsyncVolar or
+	the batch helpers they are called from several threads at once.
+
+	>>>	class SlowCalls(volar.VolarObserver):
+			def request_finished(self, event):
+				if event.total > 1:
+					log.warning('%s took %.1fs (server %.1fs)', event.route, event.total, event.wait)
+	>>>	v.observer = SlowCalls()
+	"""
+	def request_started(self, event):
+		"""called before a request is signed.  only route, method and started are set"""
+		pass
+
+	def request_finished(self, event):
+		"""called with the complete RequestEvent once a request is done"""
+		pass
+
+	def upload_finished(self, event):
+		"""called with the UploadEvent once Volar.upload_file is done"""
+		pass
+
+
+class ObserverGroup(VolarObserver):
+	"""passes every hook on to several observers"""
+	def __init__(self, *observers):
+		self.observers = observers
+
+	def request_started(self, event):
+		for observer in self.observers:
+			observer.request_started(event)
+
+	def request_finished(self, event):
+		for observer in self.observers:
+			observer.request_finished(event)
+
+	def upload_finished(self, event):
+		for observer in self.observers:
+			observer.upload_finished(event)
+
+
+class PrometheusObserver(VolarObserver):
+	"""
+	records requests and uploads as prometheus_client metrics:
+
+	  - <prefix>_requests_total{route, method, status}
+	  - <prefix>_request_seconds{route, method} : total time
+	  - <prefix>_request_phase_seconds{route, phase} : sign, connect, wait,
+	    download and decode
+	  - <prefix>_request_bytes_total{route, direction} : 'in' and 'out'
+	  - <prefix>_upload_phase_seconds{phase} : handshake, setup, transfer
+	  - <prefix>_upload_bytes_total
+
+	failed calls are counted with status 'error', cache hits with status
+	'cached'.  needs the prometheus_client module.
+
+	Args:
+		registry: CollectorRegistry to register with.  defaults to the
+		  prometheus_client default registry
+		prefix (string): metric name prefix
+	"""
+	def __init__(self, registry = None, prefix = 'volar'):
+		try:
+			import prometheus_client
+		except ImportError:
+			raise ImportError("PrometheusObserver needs the prometheus_client module")
+		kwargs = {} if registry is None else {'registry' : registry}
+		self.requests = prometheus_client.Counter(prefix + '_requests_total', 'Volar api requests', ['route', 'method', 'status'], **kwargs)
+		self.seconds = prometheus_client.Histogram(prefix + '_request_seconds', 'Volar api request time', ['route', 'method'], **kwargs)
+		self.phases = prometheus_client.Histogram(prefix + '_request_phase_seconds', 'Volar api request time by phase', ['route', 'phase'], **kwargs)
+		self.bytes = prometheus_client.Counter(prefix + '_request_bytes_total', 'Volar api request and response body bytes', ['route', 'direction'], **kwargs)
+		self.upload_phases = prometheus_client.Histogram(prefix + '_upload_phase_seconds', 'Volar upload time by phase', ['phase'], **kwargs)
+		self.upload_bytes = prometheus_client.Counter(prefix + '_upload_bytes_total', 'Volar bytes uploaded to storage', **kwargs)
+
+	def request_finished(self, event):
+		route = event.route
+		if event.error is not None:
+			status = 'error'
+		elif event.cached:
+			status = 'cached'
+		else:
+			status = str(event.status)
+		self.requests.labels(route, event.method, status).inc()
+		self.seconds.labels(route, event.method).observe(event.total)
+		if event.cached:
+			return
+		for phase in ('sign', 'connect', 'wait', 'download', 'decode'):
+			value = getattr(event, phase)
+			if value is not None:
+				self.phases.labels(route, phase).observe(value)
+		self.bytes.labels(route, 'out').inc(event.bytes_out)
+		if event.bytes_in:
+			self.bytes.labels(route, 'in').inc(event.bytes_in)
+
+	def upload_finished(self, event):
+		for phase in ('handshake', 'setup', 'transfer'):
+			self.upload_phases.labels(phase).observe(getattr(event, phase))
+		self.upload_bytes.inc(event.bytes)
+
+
+class OpenTelemetryObserver(VolarObserver):
+	"""
+	reports every request and upload as an OpenTelemetry span, with the
+	phase timings as attributes (volar.sign_seconds, volar.wait_seconds,
+	...).  spans are created once the call is done, with their real start
+	and end times.
+
+	Args:
+		tracer: tracer to create spans with.  anything with
+		  start_span(name, start_time = <ns>, attributes = <dict>) returning
+		  a span with set_status() and end(end_time = <ns>) works.  defaults
+		  to opentelemetry.trace.get_tracer('volar')
+	"""
+	def __init__(self, tracer = None):
+		if tracer is None:
+			try:
+				from opentelemetry import trace
+			except ImportError:
+				raise ImportError("OpenTelemetryObserver needs the opentelemetry-api module, or a tracer")
+			tracer = trace.get_tracer('volar')
+		self.tracer = tracer
+
+	def _span(self, name, event, attributes):
+		span = self.tracer.start_span(name, start_time = int(event.started * 1e9), attributes = dict((key, value) for key, value in attributes.iteritems() if value is not None))
+		if event.error is not None:
+			try:
+				from opentelemetry.trace import Status, StatusCode
+				span.set_status(Status(StatusCode.ERROR, event.error))
+			except ImportError:
+				pass
+		span.end(end_time = int((event.started + event.total) * 1e9))
+
+	def request_finished(self, event):
+		attributes = {
+			'http.method' : event.method,
+			'http.status_code' : event.status,
+			'volar.route' : event.route,
+			'volar.cached' : event.cached,
+			'volar.bytes_out' : event.bytes_out,
+			'volar.bytes_in' : event.bytes_in,
+			'volar.error' : event.error
+		}
+		for phase in ('sign', 'connect', 'wait', 'download', 'decode'):
+			attributes['volar.' + phase + '_seconds'] = getattr(event, phase)
+		self._span('volar ' + event.route, event, attributes)
+
+	def upload_finished(self, event):
+		self._span('volar upload', event, {
+			'volar.file_name' : event.file_name,
+			'volar.bytes' : event.bytes,
+			'volar.multipart' : event.multipart,
+			'volar.deduplicated' : event.deduplicated,
+			'volar.handshake_seconds' : event.handshake,
+			'volar.setup_seconds' : event.setup,
+			'volar.transfer_seconds' : event.transfer,
+			'volar.error' : event.error
+		})
+
+
 class Volar(object):
-	def __init__(self, api_key, secret, base_url):
+	def __init__(self, api_key, secret, base_url, pool_connections = 10, pool_maxsize = 10, pool_block = False, keep_alive = True, timeout = None, retry = None, circuit_breaker = None, codec = None):
+		"""
+		Args:
+			api_key (string): api key of the api user
+			secret (string): secret of the api user, used to sign requests
+			base_url (string): host name of the cms, ex. 'vcloud.volarvideo.com'
+			pool_connections, pool_maxsize, pool_block, keep_alive, timeout:
+			  connection pool settings.  see VolarTransport
+			retry (RetryPolicy), circuit_breaker (CircuitBreaker):
+			  resilience settings.  list reads are retried by `retry`; calls
+			  that change data are never retried.  see VolarTransport
+			codec (JsonCodec): json encoder / decoder.  defaults to
+			  JsonCodec(), which uses the stdlib json module
+		"""
 		self.api_key = api_key
 		self.secret = secret
 		self.base_url = base_url
 		self.secure = False
+		self._local = threading.local()
+		self._signer = None
 		self.error = ''
+		self.fetch_concurrency = 4
+		self.multipart_threshold = 64 * 1024 * 1024
+		self.multipart_chunksize = 16 * 1024 * 1024
+		self.multipart_workers = 4
+		self.multipart_retries = 3
+		self.upload_journal_dir = None
+		self.upload_journal_ttl = 12 * 3600
+		self.s3_connections = S3ConnectionCache()
+		self.upload_index = None
+		self.cache = None
+		self.validators = None
+		self.rate_limiter = None
+		self.codec = codec if codec is not None else JsonCodec()
+		self.observer = None
+		self.transport = VolarTransport(pool_connections = pool_connections, pool_maxsize = pool_maxsize, pool_block = pool_block, keep_alive = keep_alive, timeout = timeout, retry = retry, circuit_breaker = circuit_breaker)
+
+	@property
+	def error(self):
+		"""last error string.  tracked per thread, so a Volar instance can be shared between threads"""
+		return getattr(self._local, 'error', '')
+
+	@error.setter
+	def error(self, value):
+		self._local.error = value
+
+	@property
+	def signer(self):
+		"""RequestSigner for the current secret"""
+		signer = self._signer
+		if signer is None or signer.secret != str(self.secret):
+			signer = self._signer = RequestSigner(self.secret)
+		return signer
+
+	def pool_stats(self):
+		"""
+		gets connection pool usage
+
+		Returns:
+			dict
+			 |	{
+			 |		'requests' : number of requests sent,
+			 |		'hits' : requests that reused an open connection,
+			 |		'misses' : requests that had to open a new connection,
+			 |		'retries' : requests sent again after a failure,
+			 |		'circuit_trips' : times a circuit breaker opened,
+			 |		'circuit_rejections' : requests failed fast by an open
+			 |		  circuit breaker
+			 |	}
+		"""
+		return self.transport.stats.as_dict()
+
+	def close(self):
+		"""closes all pooled connections held by this instance"""
+		self.transport.close()
 
 	def sites(self, params = {}):
 		"""gets list of sites
@@ -61,7 +2216,7 @@ class Volar(object):
 		"""
 		return self.request(route = 'api/client/info', method = 'GET', params = params)
 
-	def broadcasts(self, params = {}):
+	def broadcasts(self, params = {}, model = None):
 		"""
 		gets list of broadcasts
 
@@ -105,6 +2260,8 @@ class Volar(object):
 			    status, id, title, description
 			  - 'sort_dir' : direction of sort.  allowed values are 'asc'
 			    (ascending) and 'desc' (descending)
+			model (class or bool): return the records as instances of this
+			  Record class instead of dicts.  True uses Broadcast
 
 		Returns:
 			false on failure, dict on success.  if failed, Volar.error can
@@ -113,7 +2270,7 @@ class Volar(object):
 		if(('site' not in params) and ('sites' not in params)):
 			self.error = '"site" or "sites" parameter is required'
 			return False
-		return self.request(route = 'api/client/broadcast', params = params)
+		return self._apply_model('broadcasts', self.request(route = 'api/client/broadcast', params = params), model)
 
 	def broadcast_create(self, params = {}):
 		"""
@@ -175,7 +2332,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/broadcast/create', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def broadcast_update(self, params = {}):
@@ -235,7 +2392,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/broadcast/update', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def broadcast_delete(self, params = {}):
@@ -266,7 +2423,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/broadcast/delete', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def broadcast_assign_playlist(self, params = {}):
@@ -339,9 +2496,9 @@ class Volar(object):
 			params (dict)
 				- 'id' : id of broadcast
 				- 'site' : slug of site broadcast belongs to
-			file_path (string)
-				if supplied, this file is uploaded to the server and attached
-				to the broadcast as an image
+			file_path (string, file-like or iterable)
+				if supplied, this file (or stream, see Volar.upload_file) is
+				uploaded to the server and attached to the broadcast as an image
 		Returns:
 			dict
 			 |	{
@@ -371,9 +2528,9 @@ class Volar(object):
 			params (dict)
 				- 'id' : id of broadcast
 				- 'site' : slug of site that broadcast is attached to.
-			string file_path
-				if supplied, this file is uploaded to the server and attached
-				to the broadcast
+			file_path (string, file-like or iterable)
+				if supplied, this file (or stream, see Volar.upload_file) is
+				uploaded to the server and attached to the broadcast
 
 		Returns:
 			dict
@@ -390,7 +2547,7 @@ class Volar(object):
 		if file_path == '':
 			return self.request(route = 'api/client/broadcast/archive', method = 'GET', params = params)
 		else:
-			fileParams = self.upload_file(file_path)
+			fileParams = self.upload_file(file_path, journal_key = _archive_journal_key('broadcast', params))
 			if fileParams == False:
 				return False
 			else:
@@ -398,7 +2555,7 @@ class Volar(object):
 					params[key] = value
 			return self.request(route = 'api/client/broadcast/archive', method = 'GET', params = params)
 
-	def videoclips(self, params = {}):
+	def videoclips(self, params = {}, model = None):
 		"""
 		gets list of videoclips
 
@@ -430,6 +2587,9 @@ class Volar(object):
 				    status, id, title, description
 				  - 'sort_dir' : direction of sort.  allowed values are 'asc'
 				    (ascending) and 'desc' (descending)
+			model (class or bool): return the records as instances of this
+			  Record class instead of dicts.  True uses Videoclip
+
 		Returns:
 			false on failure, dict on success.  if failed, Volar.error can
 			be used to get last error string
@@ -438,7 +2598,7 @@ class Volar(object):
 		if(('site' not in params) and ('sites' not in params)):
 			self.error = '"site" or "sites" parameter is required'
 			return False
-		return self.request(route = 'api/client/videoclip', params = params)
+		return self._apply_model('videoclips', self.request(route = 'api/client/videoclip', params = params), model)
 
 	def videoclip_create(self, params = {}):
 		"""
@@ -475,7 +2635,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/videoclip/create', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def videoclip_update(self, params = {}):
@@ -514,7 +2674,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/videoclip/update', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def videoclip_delete(self, params = {}):
@@ -537,7 +2697,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/videoclip/delete', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def videoclip_assign_playlist(self, params = {}):
@@ -610,9 +2770,9 @@ class Volar(object):
 			params (dict)
 				- 'id' : id of videoclip
 				- 'site' : site that video clip is owned by
-			file_path (string)
-				if supplied, this file is uploaded to the server and attached
-				to the videoclip as an image
+			file_path (string, file-like or iterable)
+				if supplied, this file (or stream, see Volar.upload_file) is
+				uploaded to the server and attached to the videoclip as an image
 		Returns:
 			dict
 			 |	{
@@ -640,9 +2800,9 @@ class Volar(object):
 			params (dict)
 				- 'id' : id of videoclip
 				- 'site' : slug of site that videoclip is attached to.
-			file_path (dict)
-				if supplied, this file is uploaded to the server and attached
-				to the videoclip
+			file_path (string, file-like or iterable)
+				if supplied, this file (or stream, see Volar.upload_file) is
+				uploaded to the server and attached to the videoclip
 		Returns:
 			dict
 			 |	{
@@ -658,7 +2818,7 @@ class Volar(object):
 		if file_path == '':
 			return self.request(route = 'api/client/videoclip/archive', method = 'GET', params = params)
 		else:
-			fileParams = self.upload_file(file_path)
+			fileParams = self.upload_file(file_path, journal_key = _archive_journal_key('videoclip', params))
 			if fileParams == False:
 				return False
 			else:
@@ -666,7 +2826,7 @@ class Volar(object):
 					params[key] = value
 			return self.request(route = 'api/client/videoclip/archive', method = 'GET', params = params)
 
-	def templates(self, params = {}):
+	def templates(self, params = {}, model = None):
 		"""
 		gets list of meta-data templates
 
@@ -691,6 +2851,9 @@ class Volar(object):
 			    description, date_modified. defaults to title
 			  - 'sort_dir' : direction of sort.  allowed values are 'asc' (ascending) and
 			    'desc' (descending). defaults to asc
+			model (class or bool): return the records as instances of this
+			  Record class instead of dicts.  True uses Template
+
 		Returns:
 			false on failure, dict on success.  if failed, Volar.error can
 			be used to get last error string
@@ -700,7 +2863,7 @@ class Volar(object):
 			self.error = '"site" parameter is required'
 			return False
 
-		return self.request(route = 'api/client/template', params = params)
+		return self._apply_model('templates', self.request(route = 'api/client/template', params = params), model)
 
 	def template_create(self, params = {}):
 		"""
@@ -773,7 +2936,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/template/create', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def template_update(self, params = {}):
@@ -816,7 +2979,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/template/update', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def template_delete(self, params = {}):
@@ -838,10 +3001,10 @@ class Volar(object):
 		if site == None:
 			self.error = 'site is required'
 			return False
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/template/delete', method = 'POST', params = { 'site' : site }, post_body = params)
 
-	def sections(self, params = {}):
+	def sections(self, params = {}, model = None):
 		"""
 		gets list of sections
 
@@ -870,6 +3033,9 @@ class Volar(object):
 			    title
 			  - 'sort_dir' : direction of sort.  allowed values are 'asc'
 			    (ascending) and 'desc' (descending)
+			model (class or bool): return the records as instances of this
+			  Record class instead of dicts.  True uses Section
+
 		Returns:
 			false on failure, dict on success.  if failed, Volar.error can
 			be used to get last error string
@@ -879,7 +3045,7 @@ class Volar(object):
 			self.error = '"site" or "sites" parameter is required'
 			return False
 
-		return self.request(route = 'api/client/section', params = params)
+		return self._apply_model('sections', self.request(route = 'api/client/section', params = params), model)
 	
 	def section_create(self, params = {}):
 		"""
@@ -914,7 +3080,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/section/create', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def section_update(self, params = {}):
@@ -950,10 +3116,10 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/section/update', method = 'POST', params = { 'site' : site }, post_body = params)
 
-	def playlists(self, params = {}):
+	def playlists(self, params = {}, model = None):
 		"""
 		gets list of playlists
 
@@ -983,6 +3149,9 @@ class Volar(object):
 			    title
 			  - 'sort_dir' : direction of sort.  allowed values are 'asc'
 			    (ascending) and 'desc' (descending)
+			model (class or bool): return the records as instances of this
+			  Record class instead of dicts.  True uses Playlist
+
 		Returns:
 			false on failure, dict on success.  if failed, Volar.error can
 			be used to get last error string
@@ -992,7 +3161,7 @@ class Volar(object):
 			self.error = '"site" or "sites" parameter is required'
 			return False
 
-		return self.request(route = 'api/client/playlist', params = params)
+		return self._apply_model('playlists', self.request(route = 'api/client/playlist', params = params), model)
 
 
 	def playlist_create(self, params = {}):
@@ -1035,7 +3204,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/playlist/create', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def playlist_update(self, params = {}):
@@ -1078,7 +3247,7 @@ class Volar(object):
 			self.error = 'site is required'
 			return False
 
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/playlist/update', method = 'POST', params = { 'site' : site }, post_body = params)
 
 	def playlist_delete(self, params = {}):
@@ -1102,13 +3271,516 @@ class Volar(object):
 		if site == None:
 			self.error = 'site is required'
 			return False
-		params = json.dumps(params)
+		params = self.codec.dumps(params)
 		return self.request(route = 'api/client/playlist/delete', method = 'POST', params = { 'site' : site }, post_body = params)
 
-	def upload_file(self, file_path):
+	def playlist_set_members(self, params = {}, concurrency = 8):
+		"""
+		makes a playlist contain exactly the given broadcasts and/or
+		videoclips.  the current members are read from the broadcasts /
+		videoclips listings filtered on the playlist, and only the
+		assignments and removals needed to get from there to the target
+		are made, up to `concurrency` at a time.  items already in place
+		are left alone.
+
+		>>>	result = v.playlist_set_members({
+				'site': 'mysite',
+				'id': 12,
+				'broadcast_ids': [1, 2, 3],
+				'videoclip_ids': []
+			})
+
+		Args:
+			params (dict)
+
+			- *required*
+
+			  - 'site' : slug of site the playlist belongs to
+			  - 'id' : id of playlist
+
+			- *optional* (a kind of item that is not given is left untouched)
+
+			  - 'broadcast_ids' : list of ids of broadcasts the playlist
+			    should contain
+			  - 'videoclip_ids' : list of ids of videoclips the playlist
+			    should contain
+			concurrency (int): maximum number of requests in flight
+		Returns:
+			false if the current members could not be read, otherwise dict
+			 |	{
+			 |		'success' : True if every needed change was made,
+			 |		'assigned' : {'broadcasts' : [ids], 'videoclips' : [ids]},
+			 |		'removed' : {'broadcasts' : [ids], 'videoclips' : [ids]},
+			 |		'unchanged' : number of items that were already in place,
+			 |		'errors' : list of {'method', 'id', 'error'} for failed changes
+			 |	}
+		"""
+		site = params.get('site')
+		playlist_id = params.get('id')
+		if site == None or playlist_id == None:
+			self.error = 'site and id are required'
+			return False
 
-		filePathBaseName = os.path.basename(file_path)
-		handshakeRes = self.request('api/client/broadcast/s3handshake', method = 'GET', params = { 'filename' : filePathBaseName });
+		changes = []
+		summary = { 'success' : True, 'assigned' : {}, 'removed' : {}, 'unchanged' : 0, 'errors' : [] }
+		for kind in ('broadcast', 'videoclip'):
+			target_ids = params.get(kind + '_ids')
+			if target_ids is None:
+				continue
+			current = self.fetch_all(kind + 's', { 'site' : site, 'playlist_id' : playlist_id }, concurrency = concurrency)
+			if current is False:
+				return False
+			current_ids = set("{0}".format(record['id']) for record in current)
+			wanted = OrderedDict(("{0}".format(item_id), item_id) for item_id in target_ids)
+			assign = [item_id for key, item_id in wanted.iteritems() if key not in current_ids]
+			remove = [record['id'] for record in current if "{0}".format(record['id']) not in wanted]
+			summary['assigned'][kind + 's'] = assign
+			summary['removed'][kind + 's'] = remove
+			summary['unchanged'] += len(wanted) - len(assign)
+			changes += [(kind + '_assign_playlist', item_id) for item_id in assign]
+			changes += [(kind + '_remove_playlist', item_id) for item_id in remove]
+
+		batch = self.batch(max_in_flight = concurrency)
+		for method, item_id in changes:
+			batch.add(method, { 'site' : site, 'id' : item_id, 'playlist_id' : playlist_id })
+		for (method, item_id), item in zip(changes, batch.execute()):
+			result = item['result']
+			if result is False or (isinstance(result, dict) and result.get('success') is False):
+				error = item['error'] or (result.get('errors') if isinstance(result, dict) else '')
+				summary['errors'].append({ 'method' : method, 'id' : item_id, 'error' : error })
+		summary['success'] = not summary['errors']
+		return summary
+
+	def iter_sites(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False):
+		"""
+		iterates over every site, fetching pages as they are needed.  see
+		Volar.iter_list
+		"""
+		return self.iter_list('sites', params, per_page, read_ahead, stream, lazy)
+
+	def iter_broadcasts(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		iterates over every broadcast matching params, fetching pages as they
+		are needed.  params are the same as for Volar.broadcasts.
+
+		>>>	for broadcast in v.iter_broadcasts({'site': 'mysite'}, read_ahead = 2):
+				print broadcast['title']
+
+		see Volar.iter_list
+		"""
+		return self.iter_list('broadcasts', params, per_page, read_ahead, stream, lazy, model)
+
+	def iter_videoclips(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		iterates over every videoclip matching params, fetching pages as they
+		are needed.  see Volar.iter_list
+		"""
+		return self.iter_list('videoclips', params, per_page, read_ahead, stream, lazy, model)
+
+	def iter_templates(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		iterates over every template matching params, fetching pages as they
+		are needed.  see Volar.iter_list
+		"""
+		return self.iter_list('templates', params, per_page, read_ahead, stream, lazy, model)
+
+	def iter_sections(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		iterates over every section matching params, fetching pages as they
+		are needed.  see Volar.iter_list
+		"""
+		return self.iter_list('sections', params, per_page, read_ahead, stream, lazy, model)
+
+	def iter_playlists(self, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		iterates over every playlist matching params, fetching pages as they
+		are needed.  see Volar.iter_list
+		"""
+		return self.iter_list('playlists', params, per_page, read_ahead, stream, lazy, model)
+
+	def iter_list(self, list_name, params = {}, per_page = None, read_ahead = 0, stream = False, lazy = False, model = None):
+		"""
+		generator yielding records from a list call one at a time.  pages are
+		requested lazily, so only the pages currently being worked on are
+		held in memory regardless of how many records the site has.
+
+		Args:
+			list_name (string): one of 'sites', 'broadcasts', 'videoclips',
+			  'templates', 'sections' or 'playlists'
+			params (dict): filters, same as for the matching list call.  if
+			  'page' is given, iteration starts at that page
+			per_page (int): page size to request.  defaults to the server's
+			  page size (or params['per_page'] if given)
+			read_ahead (int): number of pages to fetch in the background
+			  while the caller works through the current one.  0 fetches
+			  each page only when it is needed
+			stream (bool): decode records one at a time while each page
+			  downloads, instead of reading and decoding whole pages.  keeps
+			  memory use flat with large per_page values.  cannot be
+			  combined with read_ahead
+			lazy (bool): stream LazyRecords, which only decode the fields
+			  that are read.  implies stream
+			model (class or bool): yield instances of this Record class
+			  instead of dicts.  True picks the model matching list_name
+			  (see RECORD_MODELS)
+
+		Raises:
+			VolarError: if a page could not be fetched
+		"""
+		if list_name not in LIST_METHODS:
+			raise ValueError("{0} is not a list call".format(list_name))
+		cls = _model_class(list_name, model)
+		if stream or lazy:
+			if read_ahead > 0:
+				raise ValueError("read_ahead cannot be combined with stream")
+			records = self._iter_stream(list_name, params, per_page, lazy)
+		else:
+			records = self._iter_records(list_name, params, per_page, read_ahead)
+		if cls is not None:
+			return itertools.imap(cls, records)
+		return records
+
+	def _iter_records(self, list_name, params, per_page, read_ahead):
+		pages = self._iter_pages(list_name, params, per_page)
+		if read_ahead > 0:
+			pages = _read_ahead(pages, read_ahead)
+		for page in pages:
+			for record in page.get(list_name) or []:
+				yield record
+
+	def fetch_all(self, list_name, params = {}, per_page = None, concurrency = None, model = None):
+		"""
+		fetches every record of a list call at once.  the first page is read
+		to find out how many pages there are, then the remaining pages are
+		requested in parallel on at most `concurrency` workers.  records are
+		returned in the same order as walking the pages one by one would.
+
+		>>>	broadcasts = v.fetch_all('broadcasts', {'site': 'mysite'}, per_page = 100)
+
+		Args:
+			list_name (string): one of 'sites', 'broadcasts', 'videoclips',
+			  'templates', 'sections' or 'playlists'
+			params (dict): filters, same as for the matching list call
+			per_page (int): page size to request
+			concurrency (int): maximum number of pages requested at once.
+			  defaults to Volar.fetch_concurrency
+			model (class or bool): return instances of this Record class
+			  instead of dicts.  see Volar.iter_list
+		Returns:
+			false on failure, list of records on success.  if failed,
+			Volar.error can be used to get last error string
+		"""
+		if list_name not in LIST_METHODS:
+			self.error = "{0} is not a list call".format(list_name)
+			return False
+		if model:
+			try:
+				cls = _model_class(list_name, model)
+			except ValueError as e:
+				self.error = "{0}".format(e)
+				return False
+			records = self.fetch_all(list_name, params, per_page, concurrency)
+			return records if records is False else [cls(record) for record in records]
+		params = dict(params)
+		params.pop('page', None)
+		if per_page is not None:
+			params['per_page'] = per_page
+		if concurrency is None:
+			concurrency = self.fetch_concurrency
+
+		first = getattr(self, list_name)(dict(params, page = 1))
+		if first is False:
+			return False
+		records = list(first.get(list_name) or [])
+		num_pages = _num_pages(first)
+
+		if num_pages is None:
+			# no page count in the response - fall back to walking the pages
+			if len(records) < int(first.get('per_page') or params.get('per_page') or 0):
+				return records
+			try:
+				for page in self._iter_pages(list_name, dict(params, page = 2)):
+					records.extend(page.get(list_name) or [])
+			except VolarError as e:
+				self.error = "{0}".format(e)
+				return False
+			return records
+
+		if num_pages <= 1:
+			return records
+
+		def fetch_page(page):
+			result = getattr(self, list_name)(dict(params, page = page))
+			return result, self.error
+
+		pool = ThreadPool(max(1, min(concurrency, num_pages - 1)))
+		try:
+			for result, error in pool.imap(fetch_page, range(2, num_pages + 1)):
+				if result is False:
+					self.error = error
+					return False
+				records.extend(result.get(list_name) or [])
+		finally:
+			pool.terminate()
+		return records
+
+	def _iter_pages(self, list_name, params, per_page = None):
+		params = dict(params)
+		page = int(params.pop('page', 1))
+		if per_page is not None:
+			params['per_page'] = per_page
+		while True:
+			params['page'] = page
+			result = getattr(self, list_name)(dict(params))
+			if result is False:
+				raise VolarError(self.error)
+			records = result.get(list_name)
+			if records is None and 'errors' in result:
+				raise VolarError("{0}".format(result['errors']))
+			yield result
+
+			num_pages = _num_pages(result)
+			if not records or (num_pages is not None and page >= num_pages):
+				return
+			if num_pages is None and len(records) < int(result.get('per_page') or params.get('per_page') or 0):
+				return
+			page += 1
+
+	def _iter_stream(self, list_name, params, per_page = None, lazy = False):
+		params = dict(params)
+		page = int(params.pop('page', 1))
+		if per_page is not None:
+			params['per_page'] = per_page
+		while True:
+			params['page'] = page
+			records = self.request(LIST_ROUTES[list_name], 'GET', dict(params), stream = list_name, lazy = lazy)
+			if records is False:
+				raise VolarError(self.error)
+			count = 0
+			for record in records:
+				count += 1
+				yield record
+			meta = records.meta
+			if not records.found and 'errors' in meta:
+				raise VolarError("{0}".format(meta['errors']))
+
+			num_pages = _num_pages(meta)
+			if not count or (num_pages is not None and page >= num_pages):
+				return
+			if num_pages is None and count < int(meta.get('per_page') or params.get('per_page') or 0):
+				return
+			page += 1
+
+	def _apply_model(self, list_name, result, model):
+		"""result of a list call, with its records turned into `model` instances"""
+		cls = _model_class(list_name, model)
+		if cls is None or not isinstance(result, dict) or not isinstance(result.get(list_name), list):
+			return result
+		return dict(result, **{list_name : [cls(record) for record in result[list_name]]})
+
+	def batch(self, max_in_flight = 8):
+		"""
+		starts a batch of changes.  see VolarBatch
+
+		>>>	with v.batch(max_in_flight = 16) as batch:
+				for broadcast_id in ids:
+					batch.broadcast_update({'site': 'mysite', 'id': broadcast_id, 'status': 'scheduled'})
+		>>>	failed = [item for item in batch.results if item['result'] is False]
+		"""
+		return VolarBatch(self, max_in_flight)
+
+	def upload_batch(self, method, items, workers = 4, bandwidth_limit = None):
+		"""
+		uploads many files and attaches each one to its record, running up to
+		`workers` items at once so that handshakes, transfers and the final
+		archive / poster calls of different items overlap.
+
+		>>>	results = v.upload_batch('broadcast_archive', [
+				({'site': 'mysite', 'id': 1}, '/recordings/game1.mp4'),
+				({'site': 'mysite', 'id': 2}, '/recordings/game2.mp4')
+			], workers = 4, bandwidth_limit = 10 * 1024 * 1024)
+
+		Args:
+			method (string): 'broadcast_archive', 'videoclip_archive',
+			  'broadcast_poster' or 'videoclip_poster'
+			items (list): (params, file_path) pairs, exactly as they would be
+			  passed to `method`
+			workers (int): number of items processed at once
+			bandwidth_limit (int): if given, caps the combined upload rate of
+			  all workers, in bytes per second
+		Returns:
+			false if method is not supported, otherwise a list with one
+			entry per item, in the same order as items
+			 |	{
+			 |		'result' : what `method` returned for this item,
+			 |		'error' : error string if 'result' is False
+			 |	}
+		"""
+		if method not in ('broadcast_archive', 'videoclip_archive', 'broadcast_poster', 'videoclip_poster'):
+			self.error = "{0} does not upload files".format(method)
+			return False
+		progress = _TokenBucket(bandwidth_limit).take if bandwidth_limit else None
+
+		def run(item):
+			params, file_path = item
+			params = dict(params)
+			journal_key = None
+			if method.endswith('_archive'):
+				journal_key = _archive_journal_key(method.split('_')[0], params)
+			try:
+				fileParams = self.upload_file(file_path, journal_key = journal_key, progress = progress)
+				if fileParams == False:
+					return { 'result' : False, 'error' : self.error }
+				params.update(fileParams)
+				result = getattr(self, method)(params)
+			except Exception as e:
+				return { 'result' : False, 'error' : "{0}".format(e) }
+			return { 'result' : result, 'error' : self.error if result is False else '' }
+
+		pool = ThreadPool(max(1, min(workers, len(items))))
+		try:
+			return pool.map(run, items)
+		finally:
+			pool.terminate()
+
+	def upload_file(self, file_path, journal_key = None, progress = None, filename = None):
+		"""
+		uploads a file to remote storage, ready to be attached to a record by
+		one of the archive or poster calls.
+
+		files of Volar.multipart_threshold bytes or more are sent as a
+		multipart upload: the file is split into Volar.multipart_chunksize
+		parts which are sent by Volar.multipart_workers workers at once.  a
+		part that fails is retried on its own, up to Volar.multipart_retries
+		times, without re-sending the parts that already succeeded.
+
+		if Volar.upload_journal_dir is set, multipart uploads are resumable:
+		progress is journaled in that directory, and if the upload is
+		interrupted, calling upload_file again with the same (unmodified)
+		file and journal_key sends only the parts that are still missing.
+		journals expire after Volar.upload_journal_ttl seconds.
+
+		file_path may also be an open file-like object (anything with a
+		read() method, ex. a pipe from a transcoder) or an iterable of byte
+		strings.  these are sent straight to storage in
+		Volar.multipart_chunksize parts without being written to disk, so
+		at most multipart_workers + 1 parts are held in memory at a time.
+		streamed uploads cannot be resumed.
+
+		if Volar.upload_index is set to an UploadIndex, content that was
+		uploaded recently is not sent again; the earlier upload's
+		tmp_file_id / tmp_file_name are returned instead.  streams longer
+		than one part are always sent, as their content is only known
+		once they have been read (see UploadIndex).
+
+		Args:
+			file_path (string, file-like or iterable): what to upload
+			journal_key (string): identifies what the upload is for, so that
+			  the same file uploaded for two different records gets two
+			  journals.  the archive calls pass the site and record id
+			progress (function): if given, called as progress(n) each time
+			  another n bytes have been sent.  with multipart uploads it is
+			  called from several threads at once
+			filename (string): file name reported to the server.  defaults
+			  to the base name of file_path, or of the stream's name
+		Returns:
+			false on failure, dict on success.  if failed, Volar.error can
+			be used to get last error string
+			 |	{
+			 |		'tmp_file_id' : id of the uploaded file,
+			 |		'tmp_file_name' : storage key of the uploaded file,
+			 |		'bytes_uploaded' : number of bytes sent
+			 |	}
+		"""
+		observer = self.observer
+		if observer is None:
+			return self._upload_file(file_path, journal_key, progress, filename, None)
+		event = UploadEvent(filename)
+		result = self._upload_file(file_path, journal_key, progress, filename, event)
+		event.total = time.time() - event.started
+		if result is False:
+			event.error = self.error
+		elif not event.deduplicated:
+			event.bytes = result.get('bytes_uploaded') or 0
+		observer.upload_finished(event)
+		return result
+
+	def _upload_file(self, file_path, journal_key, progress, filename, event):
+		if isinstance(file_path, basestring):
+			stream = None
+			filePathBaseName = os.path.basename(filename or file_path)
+			try:
+				file_size = os.path.getsize(file_path)
+			except OSError as e:
+				self.error = "{0}".format(e)
+				return False
+		else:
+			stream = file_path if hasattr(file_path, 'read') else _IterReader(file_path)
+			name = filename or getattr(file_path, 'name', None)
+			# pipes and sockets have names like '<fdopen>'
+			filePathBaseName = os.path.basename(name) if isinstance(name, basestring) and not name.startswith('<') else 'upload'
+			file_size = None
+		if event is not None:
+			event.file_name = filePathBaseName
+
+		index = self.upload_index
+		md5 = None
+		digest = None
+		head = None
+		if index is not None and stream is None:
+			stat = os.stat(file_path)
+			found = index.lookup_file(file_path, stat)
+			if found is not None:
+				if event is not None:
+					event.deduplicated = True
+				return found
+			if file_size < self.multipart_threshold or index.hash_large:
+				# for single part uploads the same checksum is handed to boto
+				# below, so this is the only time the file is hashed
+				try:
+					with open(file_path, 'rb') as fp:
+						md5 = compute_md5(fp)[0:2]
+				except IOError as e:
+					self.error = "{0}".format(e)
+					return False
+				digest = md5[0]
+				found = index.lookup(digest)
+				if found is not None:
+					index.remember_file(file_path, stat, digest)
+					if event is not None:
+						event.deduplicated = True
+					return found
+			else:
+				digest = UploadIndex.stat_digest(file_path, stat)
+		elif stream is not None:
+			# the first part is read before anything is sent.  if it is all
+			# there is, its checksum can be looked up in the index first
+			try:
+				head = _read_full(stream, self._stream_part_size())
+			except Exception as e:
+				self.error = "{0}".format(e)
+				return False
+			if index is not None:
+				md5 = hashlib.md5(head)
+				if len(head) < self._stream_part_size():
+					found = index.lookup(md5.hexdigest())
+					if found is not None:
+						if event is not None:
+							event.deduplicated = True
+						return found
+
+		journal = None
+		if stream is None and self.upload_journal_dir and file_size >= self.multipart_threshold:
+			journal = UploadJournal.for_file(self.upload_journal_dir, file_path, journal_key, self.upload_journal_ttl)
+
+		if journal is not None and journal.handshake:
+			handshakeRes = journal.handshake
+		else:
+			if event is not None:
+				started = time.time()
+			handshakeRes = self.request('api/client/broadcast/s3handshake', method = 'GET', params = { 'filename' : filePathBaseName });
+			if event is not None:
+				event.handshake = time.time() - started
 		if not handshakeRes:
 			if self.error == '':
 				self.error = "Could not initiate file upload"
@@ -1119,53 +3791,298 @@ class Volar(object):
 		}
 		dispositionFileName = filePathBaseName.replace('"', '')
 
+		if event is not None:
+			started = time.time()
 		try:
-			connection = S3Connection(aws_access_key_id=handshakeRes['access_key'], aws_secret_access_key=handshakeRes['secret'], security_token=handshakeRes['token'])
+			bucket = self.s3_connections.checkout(handshakeRes)
 		except Exception as e:
 			self.error = "Connection failed: {0}".format(e)
 			return False
+		if event is not None:
+			event.setup = time.time() - started
+			started = time.time()
 
 		try:
-			bucket = S3Bucket(connection = connection, name = handshakeRes['bucket'])
-			k = S3Key(bucket = bucket, name = handshakeRes['key'])
-			k.content_disposition = 'attachment; filename="{0}"'.format(dispositionFileName)
-			returnVals['bytes_uploaded'] = k.set_contents_from_filename(file_path, policy = 'public-read')
+			try:
+				disposition = 'attachment; filename="{0}"'.format(dispositionFileName)
+				if stream is not None:
+					if event is not None:
+						# streams that fit in one part go up in a single request
+						event.multipart = len(head) >= self._stream_part_size()
+					returnVals['bytes_uploaded'] = self._upload_stream(handshakeRes, bucket, stream, head, disposition, progress, md5)
+					if md5 is not None:
+						digest = md5.hexdigest()
+				elif file_size >= self.multipart_threshold:
+					if event is not None:
+						event.multipart = True
+					returnVals['bytes_uploaded'] = self._upload_multipart(handshakeRes, bucket, file_path, file_size, disposition, journal, progress)
+				else:
+					k = S3Key(bucket = bucket, name = handshakeRes['key'])
+					k.content_disposition = disposition
+					if progress is None:
+						returnVals['bytes_uploaded'] = k.set_contents_from_filename(file_path, policy = 'public-read', md5 = md5)
+					else:
+						returnVals['bytes_uploaded'] = k.set_contents_from_filename(file_path, policy = 'public-read', md5 = md5, cb = _progress_cb(progress), num_cb = -1)
+			finally:
+				self.s3_connections.checkin(handshakeRes, bucket)
+		except _StaleUpload:
+			# the journaled upload can no longer be continued - start over
+			journal.remove()
+			return self._upload_file(file_path, journal_key, progress, filename, event)
 		except Exception, e:
 			self.error = "{0}".format(e)
 			return False
-
+		if event is not None:
+			event.transfer = time.time() - started
+
+		if journal is not None:
+			journal.remove()
+		if index is not None:
+			index.record(digest, returnVals)
+			if stream is None:
+				index.remember_file(file_path, stat, digest)
 		return returnVals
 
+	def _upload_multipart(self, handshakeRes, bucket, file_path, file_size, disposition, journal = None, progress = None):
+		if journal is not None and journal.upload_id:
+			mp = S3MultiPartUpload(bucket)
+			mp.key_name = handshakeRes['key']
+			mp.id = journal.upload_id
+			part_size = journal.part_size
+			try:
+				stored = set(part.part_number for part in mp.get_all_parts())
+			except Exception:
+				raise _StaleUpload()
+			done = journal.parts & stored
+		else:
+			# s3 wants parts of at least 5MB, and no more than 10000 of them
+			part_size = max(self.multipart_chunksize, 5 * 1024 * 1024, (file_size + 9999) // 10000)
+			mp = bucket.initiate_multipart_upload(handshakeRes['key'], headers = { 'Content-Disposition' : disposition }, policy = 'public-read')
+			if journal is not None:
+				journal.start(handshakeRes, mp.id, part_size)
+			done = set()
+
+		parts = [(num + 1, offset, min(part_size, file_size - offset)) for num, offset in enumerate(range(0, file_size, part_size))]
+		parts = [part for part in parts if part[0] not in done]
+
+		def open_part(offset):
+			fp = open(file_path, 'rb')
+			fp.seek(offset)
+			return fp
+
+		def upload_part(part):
+			num, offset, length = part
+			error = self._upload_part(handshakeRes, mp, num, lambda: open_part(offset), length, progress)
+			if error is None and journal is not None:
+				journal.part_done(num)
+			return error
+
+		pool = ThreadPool(max(1, min(self.multipart_workers, len(parts))))
+		try:
+			errors = [error for error in pool.imap_unordered(upload_part, parts) if error]
+			if errors:
+				raise Exception(errors[0])
+			mp.complete_upload()
+		except BaseException:
+			# a journaled upload is kept so it can be resumed
+			if journal is None:
+				_cancel_upload(mp)
+			raise
+		finally:
+			pool.terminate()
+		return file_size
+
+	def _upload_part(self, handshakeRes, mp, num, open_part, size, progress):
+		"""
+		sends part num of the multipart upload mp, retrying a failed attempt
+		up to Volar.multipart_retries times.  open_part() returns a file
+		object positioned at the start of the part.
 
-	def request(self, route, method = '', params = {}, post_body = None):
+		Returns:
+			None if the part was stored, otherwise the last error
+		"""
+		error = None
+		for attempt in range(self.multipart_retries + 1):
+			try:
+				# parts are sent in parallel, each over a connection of its own
+				bucket = self.s3_connections.checkout(handshakeRes)
+				try:
+					part_mp = S3MultiPartUpload(bucket)
+					part_mp.key_name = mp.key_name
+					part_mp.id = mp.id
+					fp = open_part()
+					try:
+						if progress is None:
+							part_mp.upload_part_from_file(fp, num, size = size)
+						else:
+							part_mp.upload_part_from_file(fp, num, size = size, cb = _progress_cb(progress), num_cb = -1)
+					finally:
+						fp.close()
+				finally:
+					self.s3_connections.checkin(handshakeRes, bucket)
+				return None
+			except Exception as e:
+				error = "part {0} failed: {1}".format(num, e)
+				if attempt < self.multipart_retries:
+					time.sleep(min(2 ** attempt, 30))
+		return error
+
+
+	def _stream_part_size(self):
+		# s3 wants parts of at least 5MB
+		return max(self.multipart_chunksize, 5 * 1024 * 1024)
+
+	def _upload_stream(self, handshakeRes, bucket, stream, data, disposition, progress = None, digest = None):
+		# data is the first part, already read.  digest, if given, is a
+		# hashlib object that has seen data and is updated with the rest
+		part_size = self._stream_part_size()
+		if len(data) < part_size:
+			# everything fit in one part - send it in a single request
+			k = S3Key(bucket = bucket, name = handshakeRes['key'])
+			k.content_disposition = disposition
+			md5 = None
+			if digest is not None:
+				md5 = (digest.hexdigest(), base64.b64encode(digest.digest()))
+			if progress is None:
+				k.set_contents_from_file(StringIO(data), policy = 'public-read', md5 = md5)
+			else:
+				k.set_contents_from_file(StringIO(data), policy = 'public-read', md5 = md5, cb = _progress_cb(progress), num_cb = -1)
+			return len(data)
+
+		mp = bucket.initiate_multipart_upload(handshakeRes['key'], headers = { 'Content-Disposition' : disposition }, policy = 'public-read')
+		workers = max(1, self.multipart_workers)
+		# parts read ahead of the workers are what bounds memory use
+		slots = threading.BoundedSemaphore(workers)
+		errors = []
+
+		def upload_part(num, data):
+			try:
+				error = self._upload_part(handshakeRes, mp, num, lambda: StringIO(data), len(data), progress)
+				if error is not None:
+					errors.append(error)
+			finally:
+				slots.release()
+
+		pool = ThreadPool(workers)
+		total = 0
+		num = 1
+		try:
+			try:
+				while data and not errors:
+					slots.acquire()
+					pool.apply_async(upload_part, (num, data))
+					total += len(data)
+					num += 1
+					data = _read_full(stream, part_size)
+					if digest is not None:
+						digest.update(data)
+			finally:
+				pool.close()
+				pool.join()
+			if errors:
+				raise Exception(errors[0])
+			mp.complete_upload()
+		except BaseException:
+			# includes errors reading the stream - what was sent can't be reused
+			_cancel_upload(mp)
+			raise
+		return total
+
+	def request(self, route, method = '', params = {}, post_body = None, stream = None, lazy = False):
+		"""
+		signs and sends a request to the cms.  the list and record calls
+		all go through here.
+
+		Args:
+			route (string): api route, ex. 'api/client/broadcast'
+			method (string): 'GET' or 'POST'.  defaults to 'GET'
+			params (dict): query parameters
+			post_body (string or dict): body of a POST
+			stream (string): name of the record list in the response, ex.
+			  'broadcasts'.  if given, a ListStream decoding those records
+			  as the body arrives is returned instead of the decoded
+			  response, and the response cache is not used
+			lazy (bool): with stream, yield LazyRecords instead of dicts
+		Returns:
+			false on failure, decoded response (or ListStream) on success.
+			if failed, Volar.error can be used to get last error string
+		"""
 		if method == '':
 			method = 'GET'
+		observer = self.observer
+		if observer is None:
+			return self._request(route, method, params, post_body, stream, lazy, None)
+		event = RequestEvent(route.strip('/'), method)
+		observer.request_started(event)
+		result = self._request(route, method, params, post_body, stream, lazy, event)
+		event.total = time.time() - event.started
+		if result is False:
+			event.error = self.error
+		observer.request_finished(event)
+		return result
+
+	def _request(self, route, method, params, post_body, stream, lazy, event):
+		if event is not None:
+			sign_started = time.time()
+
+		if type(post_body) is unicode:
+			# codecs may return unicode; the body is signed and sent as utf-8
+			post_body = post_body.encode('utf-8')
 
 		params_transformed = {}
 		for key, value in sorted(params.iteritems()):
-			if isinstance(value, dict):
-				for v_key, v_value in sorted(value.iteritems()):
-					params_transformed[ key + '[' + self.convert_val_to_str(v_key) + ']' ] = v_value
+			if type(value) in _SIGNED_SCALARS:
+				params_transformed[key] = value
+			elif isinstance(value, dict):
+				for v_key, v_value in value.iteritems():
+					params_transformed[ key + '[' + _val_to_str(v_key) + ']' ] = v_value
 			elif isinstance(value, list) or isinstance(value, tuple):
 				for v_key, v_value in enumerate(value):
-					params_transformed[ key + '[' + self.convert_val_to_str(v_key) + ']' ] = v_value
+					params_transformed[ key + '[' + _val_to_str(v_key) + ']' ] = v_value
 			else:
 				params_transformed[key] = value
 
 		params_transformed['api_key'] = self.api_key
-		signature = self.build_signature(route, method, params_transformed, post_body)
-		params_transformed['signature'] = signature
+		signer = self.signer
+		query, canonical = signer.canonicalize(params_transformed)
+		if event is not None:
+			event.sign = time.time() - sign_started
+
+		cache = self.cache
+		validators = self.validators
+		cache_key = None
+		headers = None
+		if (cache is not None or validators is not None) and stream is None and method == 'GET' and route.strip('/') in LIST_ROUTES.values():
+			cache_key = (self.base_url, route.strip('/'), canonical)
+			if cache is not None:
+				cached = cache.get(cache_key)
+				if cached is not None:
+					if event is not None:
+						event.cached = True
+					return cached
+			if validators is not None:
+				headers = validators.headers(cache_key)
+
+		if event is not None:
+			sign_started = time.time()
+		query.append(('signature', signer.sign(method, route, canonical, post_body)))
+		if event is not None:
+			event.sign += time.time() - sign_started
 
 		url = '/' + route.strip('/')
+		limiter = self.rate_limiter
+		limit = limiter.for_route(route, method) if limiter is not None else None
 
 		if self.secure:
 			url = 'https://' + self.base_url + url
 		else:
 			url = 'http://' + self.base_url + url
 
+		if event is not None:
+			connect_before = _connect_seconds()
 		try:
 			if method == 'GET':
-				r = requests.get(url, params = params_transformed)
+				r = self.transport.send('GET', url, params = query, headers = headers, idempotent = route.strip('/') in LIST_ROUTES.values(), limit = limit, stream = stream is not None or event is not None)
 			else:
 				data = {}
 				files = None
@@ -1183,43 +4100,844 @@ class Volar(object):
 				if data == {}:	#no data
 					data = None
 
-				r = requests.post(url, params = params_transformed, data = data, files = files)
-			return json.loads(r.text)
+				r = self.transport.send('POST', url, params = query, data = data, files = files, limit = limit, stream = event is not None)
+
+			if event is not None:
+				_time_response(event, r, connect_before, stream is None)
+				decode_started = time.time()
+			if stream is not None:
+				return ListStream(r, stream, lazy)
+
+			codec = self.codec
+			result = None
+			if validators is not None and cache_key is not None:
+				if r.status_code == 304:
+					result = validators.not_modified(cache_key)
+					if result is None:
+						raise Exception("server answered 304 Not Modified to a request that was not conditional")
+				else:
+					result = codec.loads(_response_text(r))
+					if r.status_code == 200:
+						validators.store(cache_key, r, result)
+			else:
+				result = codec.loads(_response_text(r))
+			if event is not None:
+				event.decode = time.time() - decode_started
 		except Exception as e:
 			self.error = "Request failed with following error: " + e.message
 			return False
 
-	def build_signature(self, route, method = '', get_params = {}, post_body = None):
-		if method == '':
-			method = 'GET'
-
-		signature = str(self.secret) + method.upper() + route.strip('/')
+		if cache is not None and isinstance(result, dict):
+			self._update_cache(cache, cache_key, route, params, 200 if r.status_code == 304 else r.status_code, result)
+		return result
+
+	def _update_cache(self, cache, cache_key, route, params, status_code, result):
+		sites = [site for site in "{0}".format(params.get('site') or params.get('sites') or '').split(',') if site]
+		if cache_key is not None:
+			if status_code == 200 and 'errors' not in result:
+				cache.set(cache_key, route, sites, result)
+			return
+		action = route.strip('/').split('/')[-1]
+		if action in MUTATION_ACTIONS and result.get('success') is not False:
+			resource = _route_resource(route)
+			for site in sites or [None]:
+				cache.invalidate(resource, site)
+				if action in ('assignplaylist', 'removeplaylist'):
+					cache.invalidate('playlist', site)
 
+	def build_signature(self, route, method = '', get_params = {}, post_body = None):
+		"""
+		signature for a request.  Volar.request signs through
+		Volar.signer directly; this is kept for callers that sign requests
+		themselves.
+		"""
+		parts = []
 		for key, value in sorted(get_params.iteritems()):
 			if isinstance(value, dict):
 				for v_key, v_value in sorted(value.iteritems()):
-					signature += key + '[' + self.convert_val_to_str(v_key) + ']=' + self.convert_val_to_str(v_value)
+					parts.append(key + '[' + _val_to_str(v_key) + ']=' + _val_to_str(v_value))
 			elif isinstance(value, list) or isinstance(value, tuple):
-				v_key = 0
-				for v_value in value:
-					signature += key + '[' + self.convert_val_to_str(v_key) + ']=' + self.convert_val_to_str(v_value)
-					v_key = v_key + 1
+				for v_key, v_value in enumerate(value):
+					parts.append(key + '[' + _val_to_str(v_key) + ']=' + _val_to_str(v_value))
 			else:
-				signature += key + '=' + self.convert_val_to_str(value)
+				parts.append(key + '=' + _val_to_str(value))
+		return self.signer.sign(method, route, ''.join(parts), post_body)
 
-		signature = signature.encode('ascii')
-		if type(post_body) is str:
-			signature += post_body
+	def convert_val_to_str(self, val):
+		return _val_to_str(val)
 
-		signature = base64.b64encode(hashlib.sha256(signature).digest())[0:43]
-		signature = signature.rstrip('=')
-		return signature
 
-	def convert_val_to_str(self, val):
-		if isinstance(val, bool):
-			if val:
-				return '1'
+class VolarFuture(object):
+	"""
+	pending result of a call made through AsyncVolar.
+	"""
+	def __init__(self, async_result):
+		self._result = async_result
+		self.error = ''
+
+	def done(self):
+		"""True once the call has finished"""
+		return self._result.ready()
+
+	def wait(self, timeout = None):
+		"""blocks until the call has finished, or timeout seconds pass"""
+		self._result.wait(timeout)
+
+	def result(self, timeout = None):
+		"""
+		blocks until the call has finished and returns its result.  the
+		result is exactly what the matching Volar method would have
+		returned; if that is False, VolarFuture.error holds the error string.
+		"""
+		value, self.error = self._result.get(timeout)
+		return value
+
+
+class AsyncVolar(object):
+	"""
+	non-blocking version of Volar.  every public method of Volar is
+	available here under the same name and with the same arguments, but
+	returns a VolarFuture immediately instead of waiting for the server.
+	calls are run on a pool of max_workers workers which share one pooled,
+	keep-alive connection to the cms.  they go through the wrapped Volar's
+	request(), so they are signed by its RequestSigner (Volar.signer), and
+	its per-route signing state is shared by every worker.
+
+	>>>	v = volar.AsyncVolar(api_key, secret, base_url, max_workers = 64)
+	>>>	futures = [v.broadcasts({'site': site['slug']}) for site in sites]
+	>>>	results = v.gather(futures)
+
+	this module targets python 2, which has no asyncio, so the workers are
+	threads.  applications built on gevent can monkey-patch threading
+	before creating an AsyncVolar, in which case every worker is a
+	greenlet and thousands of calls can be in flight at once.
+
+	Args:
+		api_key, secret, base_url: see Volar
+		max_workers (int): maximum number of calls in flight at once.  the
+		  connection pool is sized to match
+		**kwargs: any other Volar connection setting (keep_alive, timeout, ...)
+	"""
+	methods = (
+		'sites', 'broadcasts', 'broadcast_create', 'broadcast_update',
+		'broadcast_delete', 'broadcast_assign_playlist',
+		'broadcast_remove_playlist', 'broadcast_poster', 'broadcast_archive',
+		'videoclips', 'videoclip_create', 'videoclip_update',
+		'videoclip_delete', 'videoclip_assign_playlist',
+		'videoclip_remove_playlist', 'videoclip_poster', 'videoclip_archive',
+		'templates', 'template_create', 'template_update', 'template_delete',
+		'sections', 'section_create', 'section_update',
+		'playlists', 'playlist_create', 'playlist_update', 'playlist_delete',
+		'playlist_set_members', 'fetch_all', 'upload_batch', 'upload_file', 'request'
+	)
+
+	def __init__(self, api_key, secret, base_url, max_workers = 32, **kwargs):
+		kwargs.setdefault('pool_maxsize', max_workers)
+		kwargs.setdefault('pool_block', True)
+		self.client = Volar(api_key, secret, base_url, **kwargs)
+		self.max_workers = max_workers
+		self._pool = ThreadPool(max_workers)
+
+	@property
+	def secure(self):
+		return self.client.secure
+
+	@secure.setter
+	def secure(self, value):
+		self.client.secure = value
+
+	def submit(self, method, *args, **kwargs):
+		"""
+		runs Volar.<method>(*args, **kwargs) in the background
+
+		Returns:
+			VolarFuture
+		"""
+		return VolarFuture(self._pool.apply_async(self._call, (method, args, kwargs)))
+
+	def _call(self, method, args, kwargs):
+		self.client.error = ''
+		try:
+			value = getattr(self.client, method)(*args, **kwargs)
+		except Exception as e:
+			return False, "{0}".format(e)
+		return value, self.client.error
+
+	def gather(self, futures, timeout = None):
+		"""waits for every future in the list and returns their results, in order"""
+		return [future.result(timeout) for future in futures]
+
+	def pool_stats(self):
+		return self.client.pool_stats()
+
+	def close(self):
+		"""waits for calls in flight, then stops the workers and closes connections"""
+		self._pool.close()
+		self._pool.join()
+		self.client.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+def _async_method(name):
+	def method(self, *args, **kwargs):
+		return self.submit(name, *args, **kwargs)
+	method.__name__ = name
+	method.__doc__ = "non-blocking Volar.{0}.  returns a VolarFuture\n\n{1}".format(name, getattr(Volar, name).__doc__ or '')
+	return method
+
+for _name in AsyncVolar.methods:
+	setattr(AsyncVolar, _name, _async_method(_name))
+
+
+class VolarBatch(object):
+	"""
+	collects create / update / delete and playlist assignment calls and
+	runs them together, up to max_in_flight at once.  calls are queued by
+	calling them on the batch exactly as on Volar, and are sent when the
+	batch is executed - either explicitly with execute(), or when the
+	`with` block it was used in ends without an exception.
+
+	calls that touch the same record (same resource type, site and id)
+	are always run one after another, in the order they were added.
+	calls on different records have no ordering guarantee.
+
+	the cms has no bulk route, so each call is still its own request;
+	_dispatch is the single place to change if one is ever added.
+
+	>>>	batch = v.batch()
+	>>>	batch.broadcast_update({'site': 'mysite', 'id': 1, 'title': 'new title'})
+	>>>	batch.broadcast_assign_playlist({'site': 'mysite', 'id': 1, 'playlist_id': 4})
+	>>>	results = batch.execute()
+	"""
+	methods = (
+		'broadcast_create', 'broadcast_update', 'broadcast_delete',
+		'broadcast_assign_playlist', 'broadcast_remove_playlist',
+		'videoclip_create', 'videoclip_update', 'videoclip_delete',
+		'videoclip_assign_playlist', 'videoclip_remove_playlist',
+		'template_create', 'template_update', 'template_delete',
+		'section_create', 'section_update',
+		'playlist_create', 'playlist_update', 'playlist_delete'
+	)
+
+	def __init__(self, client, max_in_flight = 8):
+		self.client = client
+		self.max_in_flight = max_in_flight
+		self.operations = []
+		self.results = None
+
+	def add(self, method, params):
+		"""queues client.<method>(params).  returns the position of its result"""
+		if method not in self.methods:
+			raise ValueError("{0} cannot be batched".format(method))
+		self.operations.append((method, dict(params)))
+		return len(self.operations) - 1
+
+	def execute(self):
+		"""
+		runs every queued call
+
+		Returns:
+			list with one entry per queued call, in the order they were added
+			 |	{
+			 |		'method' : name of the call,
+			 |		'result' : what the call returned,
+			 |		'error' : error string if 'result' is False
+			 |	}
+		"""
+		operations, self.operations = self.operations, []
+		chains = OrderedDict()
+		for index, (method, params) in enumerate(operations):
+			if params.get('id') is None:
+				key = index
 			else:
-				return '0'
-		else:
-			return str(val)
\ No newline at end of file
+				key = (method.split('_')[0], params.get('site'), "{0}".format(params['id']))
+			chains.setdefault(key, []).append(index)
+
+		results = [None] * len(operations)
+
+		def run(chain):
+			for index in chain:
+				method, params = operations[index]
+				try:
+					result = self._dispatch(method, dict(params))
+					error = self.client.error if result is False else ''
+				except Exception as e:
+					result, error = False, "{0}".format(e)
+				results[index] = { 'method' : method, 'result' : result, 'error' : error }
+
+		if chains:
+			pool = ThreadPool(max(1, min(self.max_in_flight, len(chains))))
+			try:
+				pool.map(run, chains.values())
+			finally:
+				pool.terminate()
+		self.results = results
+		return results
+
+	def _dispatch(self, method, params):
+		return getattr(self.client, method)(params)
+
+	def __len__(self):
+		return len(self.operations)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.execute()
+
+
+def _batch_method(name):
+	def method(self, params = {}):
+		return self.add(name, params)
+	method.__name__ = name
+	method.__doc__ = "queues Volar.{0}(params) in the batch".format(name)
+	return method
+
+for _name in VolarBatch.methods:
+	setattr(VolarBatch, _name, _batch_method(_name))
+
+
+class SyncEvent(namedtuple('SyncEvent', ['action', 'resource', 'site', 'record'])):
+	"""
+	change found by VolarSync.  action is 'created', 'updated' or 'deleted',
+	resource the list call the record came from ('broadcasts', ...) and
+	record the record as returned by the server (for 'deleted', just
+	{'id': ...}).
+	"""
+	__slots__ = ()
+
+
+class VolarSync(object):
+	"""
+	incremental mirror feed for broadcasts and videoclips.  for every site
+	a watermark is kept in a small json state file, and each run only walks
+	the listing down to that watermark (newest first, using 'sort_by' /
+	'sort_dir'), emitting a SyncEvent for every record that is new or has
+	changed since it was last seen.
+
+	the watermark is the highest value seen of watermark_field.  with the
+	default 'id' a run finds newly created records.  any other sortable
+	field that moves forward when a record is modified can be used instead,
+	in which case updates are found as well.  deletions can only be
+	noticed by walking the whole listing, which is what a full resync
+	(run(site, full = True)) does; it also re-checks every record for
+	changes.
+
+	>>>	sync = volar.VolarSync(v, '/var/lib/mirror/sync.json')
+	>>>	for event in sync.run('mysite'):
+			print event.action, event.resource, event.record['id']
+
+	Args:
+		client (Volar): client used to read the listings
+		state_path (string): json file holding watermarks between runs
+		resources (tuple): list calls to follow
+		watermark_field (string): sortable record field used as watermark
+		per_page (int): page size to request
+	"""
+	def __init__(self, client, state_path, resources = ('broadcasts', 'videoclips'), watermark_field = 'id', per_page = 100):
+		self.client = client
+		self.state_path = state_path
+		self.resources = resources
+		self.watermark_field = watermark_field
+		self.per_page = per_page
+		self.state = {}
+		try:
+			with open(state_path, 'rb') as fp:
+				self.state = json.load(fp)
+		except (IOError, ValueError):
+			pass
+
+	@staticmethod
+	def fingerprint(record):
+		return hashlib.sha1(json.dumps(record, sort_keys = True)).hexdigest()[0:16]
+
+	def _mark(self, value):
+		if self.watermark_field == 'id':
+			return int(value)
+		return value
+
+	def run(self, site, full = False, save = True):
+		"""
+		generator yielding the SyncEvents for site since the last run.  the
+		new watermark is only saved once the generator has been exhausted,
+		so a run that is abandoned part way is simply repeated next time.
+
+		Args:
+			site (string): slug of the site to sync
+			full (bool): walk the complete listings, also finding deleted
+			  records
+			save (bool): write the state file when done.  callers that
+			  store the events somewhere pass False and call save() once
+			  the events are safely stored, so a crash in between repeats
+			  the events rather than losing them
+		Raises:
+			VolarError: if a listing could not be fetched
+		"""
+		site_state = self.state.get(site, {})
+		new_state = {}
+		for resource in self.resources:
+			previous = site_state.get(resource, {})
+			watermark = previous.get('watermark')
+			fingerprints = dict(previous.get('fingerprints', {}))
+			seen = set()
+			high = watermark
+			params = { 'site' : site, 'sort_by' : self.watermark_field, 'sort_dir' : 'desc' }
+			# incremental runs usually stop on the first page, so only read ahead on full ones
+			for record in self.client.iter_list(resource, params, per_page = self.per_page, read_ahead = 1 if full else 0):
+				mark = self._mark(record.get(self.watermark_field))
+				if not full and watermark is not None and mark < watermark:
+					break
+				if high is None or mark > high:
+					high = mark
+				record_id = str(record['id'])
+				seen.add(record_id)
+				fingerprint = self.fingerprint(record)
+				old = fingerprints.get(record_id)
+				fingerprints[record_id] = fingerprint
+				if old is None:
+					yield SyncEvent('created', resource, site, record)
+				elif old != fingerprint:
+					yield SyncEvent('updated', resource, site, record)
+			if full:
+				for record_id in [record_id for record_id in fingerprints if record_id not in seen]:
+					del fingerprints[record_id]
+					yield SyncEvent('deleted', resource, site, { 'id' : int(record_id) if record_id.isdigit() else record_id })
+			new_state[resource] = { 'watermark' : high, 'fingerprints' : fingerprints }
+
+		self.state[site] = new_state
+		if save:
+			self.save()
+
+	def save(self):
+		directory = os.path.dirname(os.path.abspath(self.state_path))
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		tmp_path = "{0}.{1}.tmp".format(self.state_path, os.getpid())
+		with open(tmp_path, 'wb') as fp:
+			json.dump(self.state, fp)
+		os.rename(tmp_path, self.state_path)
+
+
+def _template_fields(record):
+	"""template data of a record as (field, value) pairs"""
+	data = record.get('template_data')
+	if isinstance(data, dict):
+		return [(field, value) for field, value in data.iteritems() if not isinstance(value, (dict, list))]
+	if isinstance(data, list):
+		return [(item.get('title'), item.get('value')) for item in data if isinstance(item, dict) and item.get('title') is not None]
+	return []
+
+
+class VolarMirror(object):
+	"""
+	local, indexed sqlite copy of a site's broadcasts and videoclips (with
+	their playlist memberships and template data), for answering lookups
+	such as 'broadcasts in section 3 whose title starts with "Game"'
+	without a round trip to the cms.  the mirror is kept fresh by
+	refresh(), which uses VolarSync to fetch only what changed.
+
+	>>>	mirror = volar.VolarMirror(v, '/var/lib/mirror/catalog.db')
+	>>>	mirror.refresh('mysite')
+	>>>	mirror.find('broadcasts', site = 'mysite', title_prefix = 'Game', section_id = 3)
+	>>>	mirror.find('videoclips', site = 'mysite', playlist_id = 12)
+
+	Args:
+		client (Volar): client used to read the listings
+		path (string): sqlite database file
+		resources (tuple): list calls to mirror
+		watermark_field (string): sortable record field VolarSync follows.
+		  with the default 'id', incremental refreshes only pick up new
+		  records; a field that moves forward when a record is edited
+		  picks up edits as well.  see VolarSync
+	"""
+	def __init__(self, client, path, resources = ('broadcasts', 'videoclips'), watermark_field = 'id'):
+		self.client = client
+		self.path = path
+		self.resources = resources
+		self.sync = VolarSync(client, path + '.sync.json', resources, watermark_field)
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, timeout = 30, check_same_thread = False)
+		with self._lock:
+			for statement in (
+				'CREATE TABLE IF NOT EXISTS records (resource TEXT, site TEXT, id INTEGER, title TEXT COLLATE NOCASE, section_id INTEGER, status TEXT, date TEXT, data TEXT, PRIMARY KEY (resource, site, id))',
+				'CREATE INDEX IF NOT EXISTS records_title ON records (resource, title)',
+				'CREATE INDEX IF NOT EXISTS records_section ON records (resource, section_id)',
+				'CREATE INDEX IF NOT EXISTS records_status ON records (resource, status)',
+				'CREATE INDEX IF NOT EXISTS records_date ON records (resource, date)',
+				'CREATE TABLE IF NOT EXISTS playlist_items (resource TEXT, site TEXT, playlist_id INTEGER, id INTEGER, PRIMARY KEY (resource, site, playlist_id, id))',
+				'CREATE INDEX IF NOT EXISTS playlist_items_record ON playlist_items (resource, site, id)',
+				'CREATE TABLE IF NOT EXISTS template_data (resource TEXT, site TEXT, id INTEGER, field TEXT, value TEXT)',
+				'CREATE INDEX IF NOT EXISTS template_data_value ON template_data (resource, field, value)',
+				'CREATE INDEX IF NOT EXISTS template_data_record ON template_data (resource, site, id)'
+			):
+				self._db.execute(statement)
+			self._db.commit()
+
+	def refresh(self, site, full = False, playlists = False):
+		"""
+		brings the mirror of site up to date.  the first refresh of a site
+		loads everything; later ones only fetch what VolarSync reports as
+		changed, unless full is True.  with the default 'id' watermark that
+		means new records only: edits to existing records and deletions
+		are picked up by a full refresh.  the sync watermark is only
+		advanced once the changes are committed to the database.
+
+		playlist memberships can't be fetched incrementally: reloading them
+		walks every playlist of the site, so it is only done when asked
+		for, here or with refresh_playlists().
+
+		Args:
+			site (string): slug of the site
+			full (bool): re-read the complete listings, also dropping
+			  records that were deleted on the server
+			playlists (bool): also reload playlist memberships
+		Returns:
+			dict with the number of 'created', 'updated' and 'deleted' records
+		Raises:
+			VolarError: if a listing could not be fetched
+		"""
+		counts = { 'created' : 0, 'updated' : 0, 'deleted' : 0 }
+		previous = self.sync.state.get(site)
+		try:
+			for event in self.sync.run(site, full = full, save = False):
+				with self._lock:
+					if event.action == 'deleted':
+						self._delete(event.resource, site, event.record['id'])
+					else:
+						self._store(event.resource, site, event.record)
+				counts[event.action] += 1
+			with self._lock:
+				self._db.commit()
+		except BaseException:
+			# neither the records nor the watermark move on
+			with self._lock:
+				self._db.rollback()
+			if previous is None:
+				self.sync.state.pop(site, None)
+			else:
+				self.sync.state[site] = previous
+			raise
+		self.sync.save()
+		if playlists:
+			self.refresh_playlists(site)
+		return counts
+
+	def refresh_playlists(self, site):
+		"""reloads which records belong to which playlist on site"""
+		items = []
+		for playlist in self.client.iter_playlists({ 'site' : site }):
+			for resource in self.resources:
+				for record in self.client.iter_list(resource, { 'site' : site, 'playlist_id' : playlist['id'] }):
+					items.append((resource, site, int(playlist['id']), int(record['id'])))
+		with self._lock:
+			self._db.execute('DELETE FROM playlist_items WHERE site = ?', (site, ))
+			self._db.executemany('INSERT OR IGNORE INTO playlist_items (resource, site, playlist_id, id) VALUES (?, ?, ?, ?)', items)
+			self._db.commit()
+
+	def _store(self, resource, site, record):
+		record_id = int(record['id'])
+		section_id = record.get('section_id')
+		if section_id is None and isinstance(record.get('section'), dict):
+			section_id = record['section'].get('id')
+		self._db.execute('INSERT OR REPLACE INTO records (resource, site, id, title, section_id, status, date, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+			(resource, site, record_id, record.get('title'), section_id, record.get('status'), record.get('date'), json.dumps(record)))
+		self._db.execute('DELETE FROM template_data WHERE resource = ? AND site = ? AND id = ?', (resource, site, record_id))
+		self._db.executemany('INSERT INTO template_data (resource, site, id, field, value) VALUES (?, ?, ?, ?, ?)',
+			[(resource, site, record_id, field, value if value is None else "{0}".format(value)) for field, value in _template_fields(record)])
+
+	def _delete(self, resource, site, record_id):
+		for table in ('records', 'playlist_items', 'template_data'):
+			self._db.execute('DELETE FROM {0} WHERE resource = ? AND site = ? AND id = ?'.format(table), (resource, site, record_id))
+
+	def find(self, resource, site = None, id = None, title = None, title_prefix = None, section_id = None, playlist_id = None, status = None, date_from = None, date_to = None, template_data = None, sort_by = 'date', sort_dir = 'desc', limit = None):
+		"""
+		searches the mirror.  every given filter must match.
+
+		Args:
+			resource (string): 'broadcasts' or 'videoclips'
+			site (string): slug of site
+			id (int): id of record
+			title (string): text the title contains (case insensitive)
+			title_prefix (string): text the title starts with (case
+			  insensitive).  much faster than title
+			section_id (int): id of section
+			playlist_id (int): id of playlist the record belongs to
+			status (string): status of record
+			date_from, date_to (string): range of record dates, inclusive,
+			  in the server's 'YYYY-MM-DD HH:MM:SS' format
+			template_data (dict): {'field title': 'field value', ...}
+			sort_by (string): 'date', 'id', 'title' or 'status'
+			sort_dir (string): 'asc' or 'desc'
+			limit (int): maximum number of records to return
+		Returns:
+			list of records, as returned by the server
+		"""
+		where = ['r.resource = ?']
+		args = [resource]
+		if site is not None:
+			where.append('r.site = ?')
+			args.append(site)
+		if id is not None:
+			where.append('r.id = ?')
+			args.append(int(id))
+		if title is not None:
+			where.append("r.title LIKE ? ESCAPE '\\'")
+			args.append('%' + title.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+		if title_prefix is not None:
+			where.append('r.title >= ? AND r.title < ?')
+			args.extend([title_prefix, title_prefix + u'\uffff'])
+		if section_id is not None:
+			where.append('r.section_id = ?')
+			args.append(int(section_id))
+		if playlist_id is not None:
+			where.append('EXISTS (SELECT 1 FROM playlist_items p WHERE p.resource = r.resource AND p.site = r.site AND p.id = r.id AND p.playlist_id = ?)')
+			args.append(int(playlist_id))
+		if status is not None:
+			where.append('r.status = ?')
+			args.append(status)
+		if date_from is not None:
+			where.append('r.date >= ?')
+			args.append(date_from)
+		if date_to is not None:
+			where.append('r.date <= ?')
+			args.append(date_to)
+		for field, value in (template_data or {}).iteritems():
+			where.append('EXISTS (SELECT 1 FROM template_data t WHERE t.resource = r.resource AND t.site = r.site AND t.id = r.id AND t.field = ? AND t.value = ?)')
+			args.extend([field, "{0}".format(value)])
+		if sort_by not in ('date', 'id', 'title', 'status'):
+			raise ValueError("cannot sort by {0}".format(sort_by))
+		sql = 'SELECT r.data FROM records r WHERE {0} ORDER BY r.{1} {2}'.format(' AND '.join(where), sort_by, 'ASC' if sort_dir == 'asc' else 'DESC')
+		if limit is not None:
+			sql += ' LIMIT {0}'.format(int(limit))
+		with self._lock:
+			rows = self._db.execute(sql, args).fetchall()
+		return [json.loads(row[0]) for row in rows]
+
+	def close(self):
+		with self._lock:
+			self._db.close()
+
+
+# how VolarExport stores a column.  anything not listed is text
+_EXPORT_COLUMN_TYPES = {
+	'id' : 'int',
+	'section_id' : 'int',
+	'playlist_id' : 'int',
+	'date' : 'date',
+	'status' : 'category',
+	'site_slug' : 'category',
+	'timezone' : 'category'
+}
+
+
+def _export_text(value):
+	if isinstance(value, basestring):
+		return _compact(value)
+	return json.dumps(value)
+
+
+def _export_value(kind, value):
+	if value is None or value == '':
+		return None
+	if kind == 'int':
+		try:
+			return int(value)
+		except (TypeError, ValueError):
+			return None
+	if kind == 'date':
+		value = _parse_date(value)
+		return value if isinstance(value, datetime.datetime) else None
+	if kind == 'category':
+		return _intern(_export_text(value))
+	return _export_text(value)
+
+
+def _numpy_column(np, kind, values):
+	if kind == 'int':
+		return np.array([-1 if value is None else value for value in values], dtype = np.int64)
+	if kind == 'date':
+		return np.array(values, dtype = 'datetime64[s]')
+	if kind == 'category':
+		return np.array([value.encode('utf-8') if type(value) is unicode else (value or '') for value in values], dtype = np.str_)
+	column = np.empty(len(values), dtype = object)
+	column[:] = values
+	return column
+
+
+def _arrow_column(pa, kind, values):
+	if kind == 'int':
+		return pa.array(values, type = pa.int64())
+	if kind == 'date':
+		return pa.array(values, type = pa.timestamp('s'))
+	if kind == 'category':
+		return pa.array(values, type = pa.string()).dictionary_encode()
+	return pa.array(values, type = pa.string())
+
+
+class VolarExport(object):
+	"""
+	exports a list call as columns - one typed array per field - so that
+	aggregations over a whole site become vectorized operations instead of
+	loops over dicts.  records are streamed (see Volar.iter_list) and
+	converted chunk_size records at a time, so apart from the result only
+	one chunk is held in memory; to_parquet() writes each chunk out as it
+	is converted and never holds the whole export.
+
+	to_numpy() needs numpy, to_arrow() and to_parquet() need pyarrow.
+
+	>>>	export = volar.VolarExport(v, 'broadcasts')
+	>>>	columns = export.to_numpy({'site': 'mysite'})
+	>>>	archived = (columns['status'] == 'archived').sum()
+	>>>	export.to_parquet({'site': 'mysite'}, '/data/broadcasts.parquet')
+
+	column types:
+
+	  - 'id', 'section_id', 'playlist_id' : 64 bit integers.  missing
+	    values are -1 in numpy and null in arrow
+	  - 'date' : datetime64[s] in numpy, timestamp[s] in arrow.  missing or
+	    unreadable dates are NaT / null
+	  - 'status', 'site_slug', 'timezone' : byte strings in numpy,
+	    dictionary encoded strings in arrow
+	  - everything else, including template data flattened into
+	    'template_data.<field>' columns : strings (object arrays in numpy)
+
+	Args:
+		client (Volar): client used to read the listing
+		list_name (string): one of 'sites', 'broadcasts', 'videoclips',
+		  'templates', 'sections' or 'playlists'
+		columns (tuple): record fields to export.  defaults to the fields
+		  of the list's record model, without embed code and template data
+		template_fields (tuple): template data fields to flatten into
+		  columns.  None takes the fields found in the first chunk; fields
+		  that only show up later are not exported and are listed in
+		  `dropped_fields` afterwards.  () exports no template data
+		chunk_size (int): records converted (and written) at a time
+		per_page (int): page size used to read the listing
+	"""
+	def __init__(self, client, list_name, columns = None, template_fields = None, chunk_size = 10000, per_page = None):
+		if list_name not in LIST_METHODS:
+			raise ValueError("{0} is not a list call".format(list_name))
+		if columns is None:
+			model = RECORD_MODELS.get(list_name)
+			columns = [field for field in model.fields if field not in ('embed_code', 'template_data', 'data')] if model is not None else ('id', 'slug', 'title')
+		self.client = client
+		self.list_name = list_name
+		self.columns = tuple(columns)
+		self.template_fields = template_fields
+		self.chunk_size = chunk_size
+		self.per_page = per_page
+		self.dropped_fields = set()
+
+	def to_numpy(self, params = {}):
+		"""
+		Returns:
+			OrderedDict of column name => numpy array
+		Raises:
+			VolarError: if the listing could not be fetched
+		"""
+		try:
+			import numpy as np
+		except ImportError:
+			raise ImportError("VolarExport.to_numpy needs numpy")
+		parts = None
+		for chunk in self._chunks(params):
+			if parts is None:
+				parts = OrderedDict((name, []) for name, kind, values in chunk)
+			for name, kind, values in chunk:
+				parts[name].append(_numpy_column(np, kind, values))
+		return OrderedDict((name, np.concatenate(arrays)) for name, arrays in parts.iteritems())
+
+	def to_arrow(self, params = {}):
+		"""
+		Returns:
+			pyarrow.Table
+		Raises:
+			VolarError: if the listing could not be fetched
+		"""
+		pa = self._pyarrow()
+		return pa.Table.from_batches([self._batch(pa, chunk) for chunk in self._chunks(params)])
+
+	def to_parquet(self, params, path, compression = 'snappy'):
+		"""
+		writes the export to a parquet file, one row group per chunk
+
+		Returns:
+			number of records written
+		Raises:
+			VolarError: if the listing could not be fetched
+		"""
+		pa = self._pyarrow()
+		import pyarrow.parquet as pq
+		writer = None
+		rows = 0
+		try:
+			for chunk in self._chunks(params):
+				batch = self._batch(pa, chunk)
+				if writer is None:
+					writer = pq.ParquetWriter(path, batch.schema, compression = compression)
+				writer.write_table(pa.Table.from_batches([batch]))
+				rows += batch.num_rows
+		finally:
+			if writer is not None:
+				writer.close()
+		return rows
+
+	@staticmethod
+	def _pyarrow():
+		try:
+			import pyarrow
+		except ImportError:
+			raise ImportError("VolarExport.to_arrow and VolarExport.to_parquet need pyarrow")
+		return pyarrow
+
+	@staticmethod
+	def _batch(pa, chunk):
+		return pa.RecordBatch.from_arrays([_arrow_column(pa, kind, values) for name, kind, values in chunk], [name for name, kind, values in chunk])
+
+	def _chunks(self, params):
+		"""[(column name, type, values)] for every chunk_size records"""
+		self.dropped_fields = set()
+		template_fields = self.template_fields
+		records = []
+		converted = False
+		for record in self.client.iter_list(self.list_name, params, self.per_page, stream = True):
+			records.append(record)
+			if len(records) >= self.chunk_size:
+				if template_fields is None:
+					template_fields = self._find_template_fields(records)
+				yield self._convert(records, template_fields)
+				records = []
+				converted = True
+		if records or not converted:
+			if template_fields is None:
+				template_fields = self._find_template_fields(records)
+			yield self._convert(records, template_fields)
+
+	@staticmethod
+	def _find_template_fields(records):
+		fields = OrderedDict()
+		for record in records:
+			for field, value in _template_fields(record):
+				fields[field] = True
+		return tuple(fields)
+
+	def _convert(self, records, template_fields):
+		chunk = []
+		for name in self.columns:
+			kind = _EXPORT_COLUMN_TYPES.get(name, 'text')
+			chunk.append((name, kind, [_export_value(kind, record.get(name)) for record in records]))
+		if template_fields:
+			flattened = [dict(_template_fields(record)) for record in records]
+			for field in template_fields:
+				chunk.append(('template_data.' + field, 'text', [_export_value('text', data.get(field)) for data in flattened]))
+			known = set(template_fields)
+			for data in flattened:
+				self.dropped_fields.update(field for field in data if field not in known)
+		return chunk